@@ -5,53 +5,87 @@ Main entry point for the daemon process
 """
 
 import time
+import queue
+import random
+import atexit
 import logging
+import logging.handlers
 import argparse
 from pathlib import Path
 
-from src.config import Config
-from src.processor import VoiceMemoProcessor
-
 
 def setup_logging(debug=False):
-    """Configure logging for the application"""
+    """Configure logging for the application
+    
+    Log records are queued and written by a background listener thread so
+    file and console I/O stay off the processing path.
+    """
     level = logging.DEBUG if debug else logging.INFO
-    logging.basicConfig(
-        level=level,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler('ramble.log'),
-            logging.StreamHandler()
-        ]
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    
+    file_handler = logging.FileHandler('ramble.log')
+    stream_handler = logging.StreamHandler()
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+    
+    log_queue = queue.Queue(-1)
+    listener = logging.handlers.QueueListener(
+        log_queue, file_handler, stream_handler, respect_handler_level=True
     )
+    listener.start()
+    atexit.register(listener.stop)
+    
+    root_logger = logging.getLogger()
+    root_logger.setLevel(level)
+    root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
 
 
 def main():
     """Main daemon loop"""
     parser = argparse.ArgumentParser(description='Ramble Voice Memo Processing Service')
     parser.add_argument('--debug', action='store_true', help='Enable debug logging')
+    parser.add_argument('--config', help='Path to config.yaml (defaults to environment variables)')
     args = parser.parse_args()
     
     setup_logging(debug=args.debug)
     logger = logging.getLogger(__name__)
     
     try:
-        config = Config.load()
+        # Deferred so --help and logging setup don't pay for the SDK imports
+        from src.config import Config
+        from src.processor import VoiceMemoProcessor
+        
+        config = Config.load(args.config)
         processor = VoiceMemoProcessor(config)
         
+        # Dropbox setup is otherwise lazy; check it now so bad credentials or folders exit non-zero
+        processor.dropbox.ensure_ready()
+        
         logger.info("Starting Ramble voice memo processing service")
         logger.info(f"Monitoring: {config.dropbox.root_folder}/inbox/")
         
+        # Bind loop callables once rather than resolving attributes every cycle
+        process_inbox = processor.process_inbox
+        wait_for_changes = processor.wait_for_changes
+        
+        # Error backoff in seconds: doubles per consecutive failure, capped at 5 minutes
+        backoff = 1
+        
         while True:
             try:
-                processor.process_inbox()
-                time.sleep(config.processing.polling_interval)
+                process_inbox()
+                backoff = 1
+                # Block until the inbox changes; loops back on timeout as a safety net
+                wait_for_changes()
             except KeyboardInterrupt:
                 logger.info("Received shutdown signal")
+                processor.stop_event.set()
                 break
             except Exception as e:
                 logger.error(f"Error in main loop: {e}")
-                time.sleep(60)  # Wait before retrying
+                # Jitter keeps instances from retrying in lockstep after an outage
+                time.sleep(backoff * random.uniform(0.75, 1.25))
+                backoff = min(300, backoff * 2)
                 
     except Exception as e:
         logger.error(f"Failed to start service: {e}")
@@ -4,15 +4,20 @@ Setup script for Ramble - Voice Memo Processing Service
 """
 
 import os
+import shutil
 import subprocess
 import sys
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
 
 def install_requirements():
     """Install Python requirements"""
     try:
-        subprocess.check_call([sys.executable, "-m", "pip", "install", "-r", "requirements.txt"])
+        subprocess.check_call([
+            sys.executable, "-m", "pip", "install",
+            "--disable-pip-version-check", "--no-input", "--prefer-binary",
+            "-r", "requirements.txt"
+        ])
         print("✓ Python requirements installed")
     except subprocess.CalledProcessError as e:
         print(f"✗ Failed to install requirements: {e}")
@@ -35,15 +40,15 @@ def check_ffmpeg():
 
 def create_config():
     """Create config.yaml from example if it doesn't exist"""
-    config_path = Path("config.yaml")
-    example_path = Path("config.yaml.example")
+    config_path = "config.yaml"
+    example_path = "config.yaml.example"
     
-    if not config_path.exists() and example_path.exists():
-        config_path.write_text(example_path.read_text())
+    if not os.path.exists(config_path) and os.path.exists(example_path):
+        shutil.copyfile(example_path, config_path)
         print("✓ Created config.yaml from example")
         print("⚠ Please edit config.yaml with your API keys and settings")
         return True
-    elif config_path.exists():
+    elif os.path.exists(config_path):
         print("✓ config.yaml already exists")
         return True
     else:
@@ -56,8 +61,9 @@ def create_directories():
     directories = ["processed", "logs"]
     
     for directory in directories:
-        Path(directory).mkdir(exist_ok=True)
+        os.makedirs(directory, exist_ok=True)
         print(f"✓ Created directory: {directory}")
+    return True
 
 
 def main():
@@ -65,22 +71,17 @@ def main():
     print("Setting up Ramble Voice Memo Processing Service...")
     print("=" * 50)
     
-    success = True
-    
-    # Install requirements
-    if not install_requirements():
-        success = False
-    
-    # Check FFmpeg
-    if not check_ffmpeg():
-        success = False
-    
-    # Create config
-    if not create_config():
-        success = False
+    # The steps are independent, so run them concurrently; pip dominates the wall time
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [
+            executor.submit(install_requirements),
+            executor.submit(check_ffmpeg),
+            executor.submit(create_config),
+            executor.submit(create_directories),
+        ]
+        results = [future.result() for future in futures]
     
-    # Create directories
-    create_directories()
+    success = all(results)
     
     print("=" * 50)
     if success:
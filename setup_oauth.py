@@ -18,13 +18,17 @@ import argparse
 import base64
 import json
 import urllib.parse
-import urllib.request
 import webbrowser
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 from urllib.parse import parse_qs, urlparse
 import sys
 import threading
-import time
+
+import requests
+
+
+# Shared session so token requests reuse the same TLS connection
+_SESSION = requests.Session()
 
 
 class AuthHandler(BaseHTTPRequestHandler):
@@ -41,8 +45,9 @@ class AuthHandler(BaseHTTPRequestHandler):
             query_params = parse_qs(parsed_url.query)
             
             if 'code' in query_params:
-                # Store the authorization code
+                # Store the authorization code and wake the waiting thread
                 self.server.auth_code = query_params['code'][0]
+                self.server.auth_event.set()
                 
                 # Send success response
                 self.send_response(200)
@@ -84,9 +89,11 @@ class AuthHandler(BaseHTTPRequestHandler):
 def get_authorization_code(app_key: str, redirect_uri: str = "http://localhost:8080/auth") -> str:
     """Get authorization code via OAuth flow"""
     
-    # Start local server for callback
-    server = HTTPServer(('localhost', 8080), AuthHandler)
+    # Start local server for callback; threaded so a stray request (e.g. favicon)
+    # can't block the callback. HTTPServer already sets SO_REUSEADDR for reruns.
+    server = ThreadingHTTPServer(('localhost', 8080), AuthHandler)
     server.auth_code = None
+    server.auth_event = threading.Event()
     
     # Start server in a separate thread
     server_thread = threading.Thread(target=server.serve_forever, daemon=True)
@@ -109,14 +116,11 @@ def get_authorization_code(app_key: str, redirect_uri: str = "http://localhost:8
     # Wait for callback
     print("Waiting for authorization...")
     timeout = 300  # 5 minutes
-    start_time = time.time()
-    
-    while server.auth_code is None and (time.time() - start_time) < timeout:
-        time.sleep(1)
+    received = server.auth_event.wait(timeout=timeout)
     
     server.shutdown()
     
-    if server.auth_code is None:
+    if not received:
         raise TimeoutError("Authorization timed out. Please try again.")
     
     return server.auth_code
@@ -125,29 +129,24 @@ def get_authorization_code(app_key: str, redirect_uri: str = "http://localhost:8
 def exchange_code_for_tokens(app_key: str, app_secret: str, auth_code: str, redirect_uri: str = "http://localhost:8080/auth") -> dict:
     """Exchange authorization code for access and refresh tokens"""
     
-    # Prepare request
-    data = urllib.parse.urlencode({
-        'code': auth_code,
-        'grant_type': 'authorization_code',
-        'client_id': app_key,
-        'client_secret': app_secret,
-        'redirect_uri': redirect_uri
-    }).encode()
-    
     # Make request
-    req = urllib.request.Request(
+    response = _SESSION.post(
         'https://api.dropbox.com/oauth2/token',
-        data=data,
-        headers={'Content-Type': 'application/x-www-form-urlencoded'}
+        data={
+            'code': auth_code,
+            'grant_type': 'authorization_code',
+            'client_id': app_key,
+            'client_secret': app_secret,
+            'redirect_uri': redirect_uri
+        },
+        timeout=30
     )
     
-    try:
-        with urllib.request.urlopen(req) as response:
-            response_data = json.loads(response.read().decode())
-            return response_data
-    except urllib.error.HTTPError as e:
-        error_body = e.read().decode()
-        raise Exception(f"Token exchange failed: {error_body}")
+    if not response.ok:
+        raise Exception(f"Token exchange failed: {response.text}")
+    
+    # json.loads accepts the raw bytes, skipping requests' text decoding
+    return json.loads(response.content)
 
 
 def main():
@@ -22,20 +22,27 @@ Usage:
 
 import argparse
 import json
-import urllib.parse
-import urllib.request
+from urllib.parse import quote
 import sys
 
+import requests
+
+
+# Shared session so token requests reuse the same TLS connection
+_SESSION = requests.Session()
+
 
 def generate_auth_url(app_key: str, redirect_uri: str = "https://example.com/auth") -> str:
     """Generate the authorization URL for manual OAuth flow"""
     
-    auth_url = "https://www.dropbox.com/oauth2/authorize?" + urllib.parse.urlencode({
-        'client_id': app_key,
-        'response_type': 'code',
-        'redirect_uri': redirect_uri,
-        'token_access_type': 'offline'  # This is crucial for getting refresh token
-    })
+    # token_access_type=offline is crucial for getting a refresh token
+    auth_url = (
+        "https://www.dropbox.com/oauth2/authorize"
+        f"?client_id={quote(app_key, safe='')}"
+        "&response_type=code"
+        f"&redirect_uri={quote(redirect_uri, safe='')}"
+        "&token_access_type=offline"
+    )
     
     return auth_url
 
@@ -43,29 +50,24 @@ def generate_auth_url(app_key: str, redirect_uri: str = "https://example.com/aut
 def exchange_code_for_tokens(app_key: str, app_secret: str, auth_code: str, redirect_uri: str = "https://example.com/auth") -> dict:
     """Exchange authorization code for access and refresh tokens"""
     
-    # Prepare request
-    data = urllib.parse.urlencode({
-        'code': auth_code,
-        'grant_type': 'authorization_code',
-        'client_id': app_key,
-        'client_secret': app_secret,
-        'redirect_uri': redirect_uri
-    }).encode()
-    
     # Make request
-    req = urllib.request.Request(
+    response = _SESSION.post(
         'https://api.dropbox.com/oauth2/token',
-        data=data,
-        headers={'Content-Type': 'application/x-www-form-urlencoded'}
+        data={
+            'code': auth_code,
+            'grant_type': 'authorization_code',
+            'client_id': app_key,
+            'client_secret': app_secret,
+            'redirect_uri': redirect_uri
+        },
+        timeout=30
     )
     
-    try:
-        with urllib.request.urlopen(req) as response:
-            response_data = json.loads(response.read().decode())
-            return response_data
-    except urllib.error.HTTPError as e:
-        error_body = e.read().decode()
-        raise Exception(f"Token exchange failed: {error_body}")
+    if not response.ok:
+        raise Exception(f"Token exchange failed: {response.text}")
+    
+    # json.loads accepts the raw bytes, skipping requests' text decoding
+    return json.loads(response.content)
 
 
 def main():
@@ -3,13 +3,36 @@ Configuration management for Ramble service
 """
 
 import os
+import re
+import sys
 import yaml
 from dataclasses import dataclass
-from pathlib import Path
-from typing import Optional
+from functools import lru_cache
+from typing import Optional, Tuple
 
+try:
+    # libyaml C bindings are ~10x faster than the pure-Python loader
+    from yaml import CSafeLoader as _SafeLoader
+except ImportError:
+    from yaml import SafeLoader as _SafeLoader
 
-@dataclass
+
+# slots=True drops the per-instance __dict__ (Python 3.10+)
+_DATACLASS_OPTIONS = {'frozen': True, 'slots': True} if sys.version_info >= (3, 10) else {'frozen': True}
+
+_ENV_PATTERN = re.compile(r'\$\{([A-Za-z_][A-Za-z0-9_]*)\}')
+
+
+def _expand_env_var(match: re.Match) -> str:
+    """Substitute a single ${VAR} match with its environment value"""
+    env_var = match.group(1)
+    value = os.environ.get(env_var)
+    if value is None:
+        raise ValueError(f"Environment variable {env_var} not found")
+    return value
+
+
+@dataclass(**_DATACLASS_OPTIONS)
 class DropboxConfig:
     root_folder: str
     # OAuth 2.0 fields
@@ -21,7 +44,7 @@ class DropboxConfig:
     
     def __post_init__(self):
         """Validate that either OAuth or legacy token is provided"""
-        oauth_provided = all([self.app_key, self.app_secret, self.refresh_token])
+        oauth_provided = bool(self.app_key and self.app_secret and self.refresh_token)
         legacy_provided = self.access_token is not None
         
         if not oauth_provided and not legacy_provided:
@@ -29,23 +52,40 @@ class DropboxConfig:
         
         if oauth_provided and legacy_provided:
             # Prefer OAuth over legacy token
-            self.access_token = None
+            object.__setattr__(self, 'access_token', None)
 
 
-@dataclass
+@dataclass(**_DATACLASS_OPTIONS)
 class TranscriptionConfig:
     service: str
     api_key: str
 
 
-@dataclass
-class LLMConfig:
+@dataclass(**_DATACLASS_OPTIONS)
+class LLMEndpointConfig:
     service: str
     api_key: str
     model: str
 
 
-@dataclass
+@dataclass(**_DATACLASS_OPTIONS)
+class LLMConfig:
+    service: str
+    api_key: str
+    model: str
+    # "exact" reuses stored responses for identical prompts, "off" always calls the API
+    cache_mode: str = "exact"
+    # Route inbox runs with at least this many files through the provider batch API (0 disables)
+    batch_threshold: int = 0
+    # Seconds to wait for a provider batch before cancelling it and processing its files individually
+    batch_timeout: int = 3600
+    # Cheaper/faster model tried when the primary fails or its circuit breaker is open
+    fallback_model: Optional[str] = None
+    # Additional endpoints sharing the load with the one above; any of them can fail over to the others
+    endpoints: Tuple[LLMEndpointConfig, ...] = ()
+
+
+@dataclass(**_DATACLASS_OPTIONS)
 class ProcessingConfig:
     compress_audio: bool
     compression_quality: str
@@ -54,7 +94,7 @@ class ProcessingConfig:
     polling_interval: int
 
 
-@dataclass
+@dataclass(**_DATACLASS_OPTIONS)
 class Config:
     dropbox: DropboxConfig
     transcription: TranscriptionConfig
@@ -62,10 +102,14 @@ class Config:
     processing: ProcessingConfig
 
     @classmethod
-    def load(cls) -> 'Config':
+    def load(cls, config_path: Optional[str] = None) -> 'Config':
         """
-        Load configuration directly from environment variables.
+        Load configuration from a YAML file if a path is given,
+        otherwise directly from environment variables.
         """
+        if config_path:
+            return cls.load_from_yaml(config_path)
+        
         try:
             return cls.load_from_env()
         except ValueError as e:
@@ -99,7 +143,11 @@ class Config:
         llm_cfg = LLMConfig(
             service=get_env('LLM_SERVICE'),
             api_key=get_env('LLM_API_KEY'),
-            model=get_env('LLM_MODEL')
+            model=get_env('LLM_MODEL'),
+            cache_mode=get_env('LLM_CACHE_MODE', required=False, default='exact'),
+            batch_threshold=int(get_env('LLM_BATCH_THRESHOLD', required=False, default='0')),
+            batch_timeout=int(get_env('LLM_BATCH_TIMEOUT', required=False, default='3600')),
+            fallback_model=get_env('LLM_FALLBACK_MODEL', required=False)
         )
 
         processing_cfg = ProcessingConfig(
@@ -117,18 +165,75 @@ class Config:
             processing=processing_cfg
         )
     
+    @classmethod
+    def load_from_yaml(cls, config_path: str) -> 'Config':
+        """
+        Load configuration from a YAML file, resolving ${VAR} references.
+        
+        The result is cached per file version (path, mtime, size), so repeated
+        loads of an unchanged file return the same immutable instance.
+        """
+        try:
+            st = os.stat(config_path)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Configuration file not found: {config_path}")
+        
+        return _load_yaml_cached(os.path.realpath(config_path), st.st_mtime_ns, st.st_size)
+    
+    @classmethod
+    def _build_from_yaml(cls, config_path: str) -> 'Config':
+        """Parse a YAML file and build the config tree from it"""
+        # Unbuffered: the whole file is read in one call, so a userspace buffer only adds a copy
+        with open(config_path, 'rb', buffering=0) as f:
+            data = yaml.load(f.readall(), Loader=_SafeLoader) or {}
+        data = cls._resolve_env_vars(data)
+        
+        processing = {
+            'compress_audio': True,
+            'compression_quality': 'medium',
+            'max_file_size_mb': 100,
+            'min_file_size_kb': 500,
+            'polling_interval': 60,
+        }
+        processing.update(data.get('processing') or {})
+        
+        llm = dict(data['llm'])
+        llm['endpoints'] = tuple(LLMEndpointConfig(**endpoint) for endpoint in llm.get('endpoints') or ())
+        
+        return cls(
+            dropbox=DropboxConfig(**data['dropbox']),
+            transcription=TranscriptionConfig(**data['transcription']),
+            llm=LLMConfig(**llm),
+            processing=ProcessingConfig(**processing)
+        )
+    
     @staticmethod
     def _resolve_env_vars(data: dict) -> dict:
-        """Recursively resolve ${VAR} patterns with environment variables"""
-        if isinstance(data, dict):
-            return {k: Config._resolve_env_vars(v) for k, v in data.items()}
-        elif isinstance(data, list):
-            return [Config._resolve_env_vars(item) for item in data]
-        elif isinstance(data, str) and data.startswith('${') and data.endswith('}'):
-            env_var = data[2:-1]
-            value = os.getenv(env_var)
-            if value is None:
-                raise ValueError(f"Environment variable {env_var} not found")
-            return value
-        else:
-            return data
\ No newline at end of file
+        """Resolve ${VAR} patterns with environment variables
+        
+        Walks the tree with an explicit stack and substitutes strings in place;
+        the data is freshly parsed per load, so nothing shared is mutated.
+        Embedded references such as "${ROOT}/ramble" are expanded as well.
+        """
+        root = [data]
+        stack = [(root, 0)]
+        substitute = _ENV_PATTERN.sub
+        
+        while stack:
+            container, key = stack.pop()
+            value = container[key]
+            
+            if isinstance(value, dict):
+                stack.extend((value, k) for k in value)
+            elif isinstance(value, list):
+                stack.extend((value, i) for i in range(len(value)))
+            elif isinstance(value, str) and '${' in value:
+                container[key] = substitute(_expand_env_var, value)
+        
+        return root[0]
+
+
+@lru_cache(maxsize=4)
+def _load_yaml_cached(path: str, mtime_ns: int, size: int) -> Config:
+    """Build a Config for one version of a YAML file; mtime and size only key the cache"""
+    return Config._build_from_yaml(path)
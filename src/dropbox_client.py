@@ -3,8 +3,12 @@ Dropbox API client for file operations
 """
 
 import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 import tempfile
 from datetime import timezone
 
@@ -15,6 +19,16 @@ from .config import DropboxConfig
 from .utils import parse_dji_filename_date, is_dji_file
 
 
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+MAX_PARALLEL_DOWNLOADS = 8
+MAX_PARALLEL_UPLOADS = 8
+TEMP_DIR = Path(tempfile.gettempdir()) / "ramble"
+
+# Matched in C against the raw name; avoids building a suffix string per entry
+AUDIO_FILE_PATTERN = re.compile(r'\.(?:wav|mp3|m4a|aac|flac|opus|ogg)\Z', re.IGNORECASE)
+
+
 class DropboxClient:
     """Handles all Dropbox operations for the voice memo service"""
     
@@ -22,6 +36,9 @@ class DropboxClient:
         self.config = config
         self.logger = logging.getLogger(__name__)
         
+        # One pooled session sized for concurrent downloads and uploads; the SDK default keeps only 8 connections
+        session = dropbox.create_session(max_connections=MAX_PARALLEL_DOWNLOADS + MAX_PARALLEL_UPLOADS)
+        
         try:
             # Initialize client based on available credentials
             if config.app_key and config.app_secret and config.refresh_token:
@@ -29,128 +46,221 @@ class DropboxClient:
                 self.client = dropbox.Dropbox(
                     app_key=config.app_key,
                     app_secret=config.app_secret,
-                    oauth2_refresh_token=config.refresh_token
+                    oauth2_refresh_token=config.refresh_token,
+                    session=session
                 )
                 self.logger.info("Connected to Dropbox using OAuth 2.0 refresh token")
             elif config.access_token:
                 # Use legacy access token
-                self.client = dropbox.Dropbox(config.access_token)
+                self.client = dropbox.Dropbox(config.access_token, session=session)
                 self.logger.warning("Using legacy access token - this will expire. Consider switching to OAuth 2.0")
             else:
                 raise ValueError("No valid Dropbox credentials provided")
             
-            # Test the connection
-            self.client.users_get_current_account()
-            self.logger.info("Dropbox connection verified successfully")
-            
-            # Create required folder structure
-            self._create_required_folders()
-            
-        except AuthError as e:
-            raise ValueError(f"Invalid Dropbox credentials: {e}")
         except Exception as e:
             raise ConnectionError(f"Failed to connect to Dropbox: {e}")
+        
+        # Folder paths are fixed for the client's lifetime, so build them once
+        root = config.root_folder.rstrip('/')
+        self.inbox_path = f"{root}/inbox"
+        self.processing_prefix = f"{root}/processing/"
+        self.failed_prefix = f"{root}/failed/"
+        self.processed_prefix = f"{root}/processed/"
+        
+        # Connection verification and folder setup are deferred until first use
+        self._ready = False
+        self._ready_lock = threading.Lock()
+    
+    def ensure_ready(self):
+        """Verify the connection and create the folder structure once, on first use"""
+        if self._ready:
+            return
+        
+        with self._ready_lock:
+            if self._ready:
+                return
+            
+            try:
+                # Test the connection
+                self.client.users_get_current_account()
+                self.logger.info("Dropbox connection verified successfully")
+                
+                # Create required folder structure
+                self._create_required_folders()
+                
+            except AuthError as e:
+                raise ValueError(f"Invalid Dropbox credentials: {e}")
+            except Exception as e:
+                raise ConnectionError(f"Failed to connect to Dropbox: {e}")
+            
+            self._ready = True
     
     def list_inbox_files(self) -> List[Dict]:
         """List all audio files in the inbox folder"""
-        inbox_path = f"{self.config.root_folder}/inbox"
-        audio_extensions = {'.wav', '.mp3', '.m4a', '.aac', '.flac', '.opus', '.ogg'}
+        self.ensure_ready()
+        inbox_path = self.inbox_path
         
-        self.logger.debug(f"Checking inbox path: '{inbox_path}'")
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("Checking inbox path: '%s'", inbox_path)
         
-        # Debug: Also check what's in the root folder
         try:
-            root_result = self.client.files_list_folder(self.config.root_folder)
-            self.logger.debug(f"Root folder contents: {[entry.name for entry in root_result.entries]}")
-        except Exception as e:
-            self.logger.debug(f"Couldn't list root folder: {e}")
-        
-        try:
-            # Try with recursive=True to see if there are any nested files
-            result = self.client.files_list_folder(inbox_path, recursive=True)
-            files = []
-            
-            self.logger.debug(f"Found {len(result.entries)} total entries in inbox")
-            
-            # Debug: Print all entries regardless of type
-            for entry in result.entries:
-                self.logger.debug(f"Raw entry: {entry.name} | Type: {type(entry).__name__} | Path: {getattr(entry, 'path_display', 'N/A')}")
+            entries, _ = self._collect_entries(self.client.files_list_folder(inbox_path))
+            files = self._audio_files_from_entries(entries)
             
-            for entry in result.entries:
-                self.logger.debug(f"Found entry: {entry.name} (type: {type(entry).__name__})")
-                if isinstance(entry, dropbox.files.FileMetadata):
-                    file_ext = Path(entry.name).suffix.lower()
-                    self.logger.debug(f"File extension: {file_ext}, checking against: {audio_extensions}")
-                    if file_ext in audio_extensions:
-                        self.logger.info(f"Adding audio file to processing queue: {entry.name}")
-                        
-                        # Determine creation time: use DJI filename date for DJI files, fallback to client_modified
-                        created_time = None
-                        
-                        if is_dji_file(entry.name):
-                            # Try to extract date from DJI filename
-                            dji_datetime = parse_dji_filename_date(entry.name)
-                            if dji_datetime:
-                                created_time = dji_datetime
-                                self.logger.info(f"Using DJI filename date for {entry.name}: {created_time}")
-                            else:
-                                self.logger.warning(f"Failed to parse DJI filename date for {entry.name}, falling back to client_modified")
-                        
-                        # Use client_modified as fallback (for non-DJI files or failed DJI parsing)
-                        if created_time is None:
-                            # Convert UTC timestamp to local time
-                            # Use client_modified (original file date) instead of server_modified (upload date)
-                            utc_time = entry.client_modified.replace(tzinfo=timezone.utc)
-                            created_time = utc_time.astimezone()
-                            if not is_dji_file(entry.name):
-                                self.logger.debug(f"Using client_modified date for {entry.name}: {created_time}")
-                        
-                        files.append({
-                            'name': entry.name,
-                            'path': entry.path_display,
-                            'size': entry.size,
-                            'created_time': created_time,
-                            'id': entry.id
-                        })
-                    else:
-                        self.logger.debug(f"Skipping non-audio file: {entry.name}")
-            
-            self.logger.info(f"Found {len(files)} audio files in inbox")
+            self.logger.info("Found %s audio files in inbox", len(files))
             return files
             
         except ApiError as e:
             # Handle path not found errors
             if 'not_found' in str(e).lower() or 'path_not_found' in str(e).lower():
-                self.logger.warning(f"Inbox folder not found: {inbox_path}")
+                self.logger.warning("Inbox folder not found: %s", inbox_path)
                 self.logger.info("Creating required folders...")
                 self._create_required_folders()
                 return []
             raise e
     
+    def list_inbox_changes(self, cursor: str) -> Tuple[List[Dict], str]:
+        """
+        List audio files added to the inbox since cursor
+        
+        Only the delta is fetched, so the cost scales with the number of
+        changes rather than the size of the inbox.
+        
+        Returns:
+            Tuple of (audio files, cursor for the next call)
+        """
+        self.ensure_ready()
+        entries, cursor = self._collect_entries(self.client.files_list_folder_continue(cursor))
+        files = self._audio_files_from_entries(entries)
+        
+        if files:
+            self.logger.info("Found %s new audio files in inbox", len(files))
+        return files, cursor
+    
+    def _collect_entries(self, result) -> Tuple[List, str]:
+        """Gather entries from a list_folder result, following pagination"""
+        entries = list(result.entries)
+        
+        # Follow pagination so large inboxes aren't silently truncated
+        while result.has_more:
+            result = self.client.files_list_folder_continue(result.cursor)
+            entries.extend(result.entries)
+        
+        return entries, result.cursor
+    
+    def _audio_files_from_entries(self, entries: List) -> List[Dict]:
+        """Build file info dicts for the audio files among list_folder entries"""
+        debug_enabled = self.logger.isEnabledFor(logging.DEBUG)
+        files = []
+        
+        if debug_enabled:
+            self.logger.debug("Found %s total entries in inbox", len(entries))
+        
+        for entry in entries:
+            # Deleted entries in a delta are files that already left the inbox
+            if not isinstance(entry, dropbox.files.FileMetadata):
+                continue
+            
+            if AUDIO_FILE_PATTERN.search(entry.name):
+                self.logger.info("Adding audio file to processing queue: %s", entry.name)
+                
+                # Determine creation time: use DJI filename date for DJI files, fallback to client_modified
+                created_time = None
+                
+                if is_dji_file(entry.name):
+                    # Try to extract date from DJI filename
+                    dji_datetime = parse_dji_filename_date(entry.name)
+                    if dji_datetime:
+                        created_time = dji_datetime
+                        self.logger.info("Using DJI filename date for %s: %s", entry.name, created_time)
+                    else:
+                        self.logger.warning("Failed to parse DJI filename date for %s, falling back to client_modified", entry.name)
+                
+                # Use client_modified as fallback (for non-DJI files or failed DJI parsing)
+                if created_time is None:
+                    # Convert UTC timestamp to local time
+                    # Use client_modified (original file date) instead of server_modified (upload date)
+                    utc_time = entry.client_modified.replace(tzinfo=timezone.utc)
+                    created_time = utc_time.astimezone()
+                    if debug_enabled and not is_dji_file(entry.name):
+                        self.logger.debug("Using client_modified date for %s: %s", entry.name, created_time)
+                
+                files.append({
+                    'name': entry.name,
+                    'path': entry.path_display,
+                    'size': entry.size,
+                    'created_time': created_time,
+                    'id': entry.id,
+                    'content_hash': entry.content_hash
+                })
+            elif debug_enabled:
+                self.logger.debug("Skipping non-audio file: %s", entry.name)
+        
+        return files
+    
+    def get_inbox_cursor(self) -> str:
+        """Get a cursor for the current state of the inbox folder"""
+        self.ensure_ready()
+        result = self.client.files_list_folder_get_latest_cursor(self.inbox_path)
+        return result.cursor
+    
+    def wait_for_inbox_changes(self, cursor: str, timeout: int = 480) -> bool:
+        """Block until the inbox changes relative to cursor or timeout expires
+        
+        Uses Dropbox's longpoll endpoint, which does not count against rate limits.
+        Returns True if changes were detected.
+        """
+        result = self.client.files_list_folder_longpoll(cursor, timeout=timeout)
+        
+        if result.backoff:
+            self.logger.debug("Dropbox requested longpoll backoff of %ss", result.backoff)
+            time.sleep(result.backoff)
+        
+        return result.changes
+    
     def move_to_processing(self, file_info: Dict) -> str:
         """Move file from inbox to processing folder"""
-        processing_path = f"{self.config.root_folder}/processing/{file_info['name']}"
+        self.ensure_ready()
+        processing_path = self.processing_prefix + file_info['name']
         
         try:
             self.client.files_move_v2(file_info['path'], processing_path)
-            self.logger.info(f"Moved {file_info['name']} to processing")
+            self.logger.info("Moved %s to processing", file_info['name'])
             return processing_path
         except ApiError as e:
             raise Exception(f"Failed to move file to processing: {e}")
     
+    def get_temporary_link(self, dropbox_path: str) -> Optional[str]:
+        """
+        Get a short-lived (4 hour) direct download URL for a file
+        
+        Returns:
+            The URL, or None if Dropbox couldn't issue one
+        """
+        self.ensure_ready()
+        try:
+            return self.client.files_get_temporary_link(dropbox_path).link
+        except ApiError as e:
+            self.logger.warning("Failed to get temporary link for %s: %s", dropbox_path, e)
+            return None
+    
     def download_file(self, dropbox_path: str, filename: str) -> Path:
         """Download file to temporary local storage"""
-        temp_dir = Path(tempfile.gettempdir()) / "ramble"
-        temp_dir.mkdir(exist_ok=True)
-        
-        local_path = temp_dir / filename
+        self.ensure_ready()
+        local_path = TEMP_DIR / filename
         
         try:
-            with open(local_path, 'wb') as f:
-                metadata, response = self.client.files_download(dropbox_path)
-                f.write(response.content)
+            # Cheap, and recreates the scratch dir if a tmp cleaner removed it
+            TEMP_DIR.mkdir(exist_ok=True)
+            
+            metadata, response = self.client.files_download(dropbox_path)
+            
+            # Stream to disk in 1 MiB chunks rather than holding the whole file in memory
+            with response, open(local_path, 'wb', buffering=DOWNLOAD_CHUNK_SIZE) as f:
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
             
-            self.logger.info(f"Downloaded {filename} to {local_path}")
+            self.logger.info("Downloaded %s to %s", filename, local_path)
             return local_path
             
         except ApiError as e:
@@ -158,63 +268,160 @@ class DropboxClient:
     
     def move_to_failed(self, file_info: Dict):
         """Move file from inbox to failed folder"""
-        failed_path = f"{self.config.root_folder}/failed/{file_info['name']}"
+        failed_path = self.failed_prefix + file_info['name']
         
         try:
             self.client.files_move_v2(file_info['path'], failed_path)
-            self.logger.warning(f"Moved {file_info['name']} to failed folder")
+            self.logger.warning("Moved %s to failed folder", file_info['name'])
         except ApiError as e:
-            self.logger.error(f"Failed to move file to failed folder: {e}")
+            self.logger.error("Failed to move file to failed folder: %s", e)
     
     def move_to_failed_from_processing(self, processing_path: str):
         """Move file from processing to failed folder"""
         filename = Path(processing_path).name
-        failed_path = f"{self.config.root_folder}/failed/{filename}"
+        failed_path = self.failed_prefix + filename
         
         try:
             self.client.files_move_v2(processing_path, failed_path)
-            self.logger.warning(f"Moved {filename} from processing to failed")
+            self.logger.warning("Moved %s from processing to failed", filename)
         except ApiError as e:
-            self.logger.error(f"Failed to move file from processing to failed: {e}")
+            self.logger.error("Failed to move file from processing to failed: %s", e)
     
     def delete_processing_file(self, processing_path: str):
         """Delete file from processing folder after successful processing"""
         try:
             self.client.files_delete_v2(processing_path)
             filename = Path(processing_path).name
-            self.logger.info(f"Deleted processed file: {filename}")
+            self.logger.info("Deleted processed file: %s", filename)
         except ApiError as e:
-            self.logger.error(f"Failed to delete processing file: {e}")
+            self.logger.error("Failed to delete processing file: %s", e)
     
     def upload_to_processed(self, local_path: Path, remote_path: str):
         """Upload processed file to the processed folder"""
+        self.ensure_ready()
         try:
+            size = local_path.stat().st_size
+            mode = dropbox.files.WriteMode.overwrite
+            
             with open(local_path, 'rb') as f:
-                self.client.files_upload(
-                    f.read(),
-                    remote_path,
-                    mode=dropbox.files.WriteMode.overwrite
-                )
-            self.logger.info(f"Uploaded to processed: {remote_path}")
+                if size <= UPLOAD_CHUNK_SIZE:
+                    self.client.files_upload(f.read(), remote_path, mode=mode)
+                else:
+                    # Upload session keeps memory bounded by the chunk size and lifts the 150 MB limit
+                    session = self.client.files_upload_session_start(f.read(UPLOAD_CHUNK_SIZE))
+                    cursor = dropbox.files.UploadSessionCursor(session_id=session.session_id, offset=f.tell())
+                    commit = dropbox.files.CommitInfo(path=remote_path, mode=mode)
+                    
+                    while True:
+                        chunk = f.read(UPLOAD_CHUNK_SIZE)
+                        if f.tell() >= size:
+                            self.client.files_upload_session_finish(chunk, cursor, commit)
+                            break
+                        self.client.files_upload_session_append_v2(chunk, cursor)
+                        cursor.offset = f.tell()
+            self.logger.info("Uploaded to processed: %s", remote_path)
         except ApiError as e:
             raise Exception(f"Failed to upload processed file: {e}")
     
+    def upload_many_to_processed(self, uploads: List[Tuple[Path, str]]):
+        """
+        Upload several files to the processed folder concurrently
+        
+        Files up to UPLOAD_CHUNK_SIZE share one batch of upload sessions and are
+        committed together, which avoids write-lock contention between parallel
+        uploads; larger files use their own chunked session.
+        
+        Args:
+            uploads: List of (local_path, remote_path) pairs
+        """
+        if not uploads:
+            return
+        
+        self.ensure_ready()
+        
+        small_files = []
+        large_files = []
+        for local_path, remote_path in uploads:
+            if local_path.stat().st_size <= UPLOAD_CHUNK_SIZE:
+                small_files.append((local_path, remote_path))
+            else:
+                large_files.append((local_path, remote_path))
+        
+        # Leaving the executor waits for in-flight uploads, even when one has failed
+        with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_UPLOADS, len(uploads))) as executor:
+            futures = [executor.submit(self.upload_to_processed, *item) for item in large_files]
+            if small_files:
+                self._upload_batch_to_processed(small_files, executor)
+            for future in futures:
+                future.result()
+    
+    def _upload_batch_to_processed(self, uploads: List[Tuple[Path, str]], executor: ThreadPoolExecutor):
+        """Upload small files through one batch of upload sessions and a single commit"""
+        mode = dropbox.files.WriteMode.overwrite
+        
+        def send(item):
+            session_id, (local_path, remote_path) = item
+            data = local_path.read_bytes()
+            # Batch commits require each session to be closed with all of its data
+            self.client.files_upload_session_append_v2(
+                data, dropbox.files.UploadSessionCursor(session_id=session_id, offset=0), close=True
+            )
+            return dropbox.files.UploadSessionFinishArg(
+                cursor=dropbox.files.UploadSessionCursor(session_id=session_id, offset=len(data)),
+                commit=dropbox.files.CommitInfo(path=remote_path, mode=mode)
+            )
+        
+        try:
+            start = self.client.files_upload_session_start_batch(len(uploads))
+            entries = list(executor.map(send, zip(start.session_ids, uploads)))
+            result = self.client.files_upload_session_finish_batch_v2(entries)
+        except ApiError as e:
+            raise Exception(f"Failed to upload processed files: {e}")
+        
+        for (_, remote_path), entry in zip(uploads, result.entries):
+            if not entry.is_success():
+                raise Exception(f"Failed to upload processed file {remote_path}: {entry.get_failure()}")
+            self.logger.info("Uploaded to processed: %s", remote_path)
+    
     def _create_required_folders(self):
         """Create the required folder structure in Dropbox"""
         folders = [
-            f"{self.config.root_folder}/inbox",
-            f"{self.config.root_folder}/processing", 
-            f"{self.config.root_folder}/failed",
-            f"{self.config.root_folder}/processed"
+            self.inbox_path,
+            self.processing_prefix.rstrip('/'),
+            self.failed_prefix.rstrip('/'),
+            self.processed_prefix.rstrip('/')
         ]
         
-        for folder_path in folders:
-            try:
-                self.client.files_create_folder_v2(folder_path)
-                self.logger.info(f"Created folder: {folder_path}")
-            except ApiError as e:
-                if 'already_exists' in str(e).lower():
-                    self.logger.debug(f"Folder already exists: {folder_path}")
-                else:
-                    self.logger.warning(f"Failed to create folder {folder_path}: {e}")
-                    # Don't raise - some folders might already exist
\ No newline at end of file
+        try:
+            # One RPC for all folders instead of one per folder
+            launch = self.client.files_create_folder_batch(folders)
+            
+            if launch.is_async_job_id():
+                job_id = launch.get_async_job_id()
+                status = self.client.files_create_folder_batch_check(job_id)
+                while status.is_in_progress():
+                    time.sleep(1)
+                    status = self.client.files_create_folder_batch_check(job_id)
+                result = status.get_complete() if status.is_complete() else None
+            else:
+                result = launch.get_complete() if launch.is_complete() else None
+            
+            if result is None:
+                self.logger.warning("Failed to create required folders: %s", launch)
+                return
+            
+        except ApiError as e:
+            # Don't raise - the folders might already exist
+            self.logger.warning("Failed to create required folders: %s", e)
+            return
+        
+        for folder_path, entry in zip(folders, result.entries):
+            if entry.is_success():
+                self.logger.info("Created folder: %s", folder_path)
+                continue
+            
+            error = entry.get_failure()
+            if error.is_path() and error.get_path().is_conflict():
+                self.logger.debug("Folder already exists: %s", folder_path)
+            else:
+                self.logger.warning("Failed to create folder %s: %s", folder_path, error)
\ No newline at end of file
@@ -3,22 +3,37 @@ Error handling and retry logic for the Ramble service
 """
 
 import logging
+import random
+import threading
 import time
-from functools import wraps
+from functools import lru_cache, wraps
 from typing import Callable, Any, Optional, Tuple, Type
 
 
+@lru_cache(maxsize=32)
+def _backoff_schedule(base_delay: float, backoff_factor: float, retries: int) -> Tuple[float, ...]:
+    """Delays to wait before each retry, e.g. (1.0, 2.0, 4.0) for base 1 and factor 2"""
+    return tuple(base_delay * backoff_factor ** attempt for attempt in range(retries))
+
+
 class RetryError(Exception):
     """Exception raised when maximum retries are exceeded"""
     pass
 
 
+class CircuitOpenError(Exception):
+    """Exception raised when a circuit breaker blocks a call"""
+    pass
+
+
 class ErrorHandler:
     """Handles error recovery and retry logic"""
     
-    def __init__(self, max_retries: int = 3, base_delay: float = 1.0):
+    def __init__(self, max_retries: int = 3, base_delay: float = 1.0, stop_event: Optional[threading.Event] = None):
         self.max_retries = max_retries
         self.base_delay = base_delay
+        # Setting this event aborts any pending retry wait (e.g. on shutdown)
+        self.stop_event = stop_event or threading.Event()
         self.logger = logging.getLogger(__name__)
     
     def retry_with_backoff(
@@ -45,23 +60,25 @@ class ErrorHandler:
             Result of successful function call
             
         Raises:
-            RetryError: If maximum retries exceeded
+            RetryError: If maximum retries exceeded or stop_event is set while waiting
         """
         retries = max_retries or self.max_retries
-        delay = self.base_delay
+        delays = _backoff_schedule(self.base_delay, backoff_factor, retries)
         
         for attempt in range(retries + 1):
             try:
                 return func(*args, **kwargs)
             except exceptions as e:
                 if attempt == retries:
-                    self.logger.error(f"Function {func.__name__} failed after {retries} retries: {e}")
+                    self.logger.error("Function %s failed after %s retries: %s", func.__name__, retries, e)
                     raise RetryError(f"Maximum retries ({retries}) exceeded for {func.__name__}: {e}")
                 
-                self.logger.warning(f"Attempt {attempt + 1} failed for {func.__name__}: {e}")
-                self.logger.info(f"Waiting {delay:.1f}s before retry...")
-                time.sleep(delay)
-                delay *= backoff_factor
+                self.logger.warning("Attempt %s failed for %s: %s", attempt + 1, func.__name__, e)
+                # Up to 10% jitter so concurrent callers don't retry in lockstep
+                delay = delays[attempt] * (1 + random.random() * 0.1)
+                self.logger.info("Waiting %.1fs before retry...", delay)
+                if self.stop_event.wait(delay):
+                    raise RetryError(f"Retry of {func.__name__} aborted: shutdown requested")
     
     def safe_operation(
         self,
@@ -84,10 +101,10 @@ class ErrorHandler:
         """
         try:
             result = func(*args, **kwargs)
-            self.logger.info(f"{operation_name} completed successfully")
+            self.logger.info("%s completed successfully", operation_name)
             return True, result
         except Exception as e:
-            self.logger.error(f"{operation_name} failed: {e}")
+            self.logger.error("%s failed: %s", operation_name, e)
             return False, None
 
 
@@ -106,11 +123,13 @@ def retry_on_failure(
         backoff_factor: Factor to multiply delay by on each retry
         base_delay: Initial delay between retries
     """
+    # Built once per decoration rather than on every call
+    retry_with_backoff = ErrorHandler(max_retries, base_delay).retry_with_backoff
+    
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
-            handler = ErrorHandler(max_retries, base_delay)
-            return handler.retry_with_backoff(
+            return retry_with_backoff(
                 func,
                 *args,
                 max_retries=max_retries,
@@ -134,6 +153,8 @@ class CircuitBreaker:
         self.last_failure_time = None
         self.state = "CLOSED"  # CLOSED, OPEN, HALF_OPEN
         self.logger = logging.getLogger(__name__)
+        # Guards state transitions; the common success path doesn't take it
+        self._lock = threading.Lock()
     
     def call(self, func: Callable, *args, **kwargs) -> Any:
         """
@@ -148,14 +169,17 @@ class CircuitBreaker:
             Result of function call
             
         Raises:
-            Exception: If circuit is open or function fails
+            CircuitOpenError: If circuit is open
+            Exception: If function fails
         """
         if self.state == "OPEN":
-            if self._should_attempt_reset():
-                self.state = "HALF_OPEN"
-                self.logger.info("Circuit breaker entering HALF_OPEN state")
-            else:
-                raise Exception("Circuit breaker is OPEN - operation blocked")
+            with self._lock:
+                if self.state == "OPEN":
+                    if self._should_attempt_reset():
+                        self.state = "HALF_OPEN"
+                        self.logger.info("Circuit breaker entering HALF_OPEN state")
+                    else:
+                        raise CircuitOpenError("Circuit breaker is OPEN - operation blocked")
         
         try:
             result = func(*args, **kwargs)
@@ -165,28 +189,38 @@ class CircuitBreaker:
             self._on_failure()
             raise e
     
+    def allows_call(self) -> bool:
+        """Whether call() would run the function now (closed, half-open, or open with the cooldown elapsed)"""
+        return self.state != "OPEN" or self._should_attempt_reset()
+    
     def _should_attempt_reset(self) -> bool:
         """Check if enough time has passed to attempt reset"""
         if self.last_failure_time is None:
             return True
-        return time.time() - self.last_failure_time >= self.recovery_timeout
+        return time.monotonic() - self.last_failure_time >= self.recovery_timeout
     
     def _on_success(self):
         """Handle successful operation"""
-        if self.state == "HALF_OPEN":
-            self.state = "CLOSED"
-            self.logger.info("Circuit breaker reset to CLOSED state")
-        self.failure_count = 0
-        self.last_failure_time = None
+        # Nothing to reset when already healthy, so skip the lock
+        if self.state == "CLOSED" and self.failure_count == 0:
+            return
+        
+        with self._lock:
+            if self.state == "HALF_OPEN":
+                self.state = "CLOSED"
+                self.logger.info("Circuit breaker reset to CLOSED state")
+            self.failure_count = 0
+            self.last_failure_time = None
     
     def _on_failure(self):
         """Handle failed operation"""
-        self.failure_count += 1
-        self.last_failure_time = time.time()
-        
-        if self.failure_count >= self.failure_threshold:
-            self.state = "OPEN"
-            self.logger.warning(f"Circuit breaker opened after {self.failure_count} failures")
+        with self._lock:
+            self.failure_count += 1
+            self.last_failure_time = time.monotonic()
+            
+            if self.failure_count >= self.failure_threshold:
+                self.state = "OPEN"
+                self.logger.warning("Circuit breaker opened after %s failures", self.failure_count)
 
 
 # Common error types for the Ramble service
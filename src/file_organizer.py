@@ -2,22 +2,136 @@
 File organization and output structure management
 """
 
+import atexit
+import hashlib
 import json
 import logging
+import multiprocessing
+import os
 import shutil
+import tempfile
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, wait
 from datetime import datetime
+from itertools import islice
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Optional, Tuple
 
 import ffmpeg
 
+try:
+    # Optional: PyAV encodes in-process, avoiding an ffmpeg subprocess per file
+    import av
+except ImportError:
+    av = None
+
+try:
+    # Optional: orjson serializes straight to bytes, much faster than stdlib json
+    import orjson
+except ImportError:
+    orjson = None
+
 from .config import ProcessingConfig
 
 
+ENCODE_CACHE_ENTRIES = 32
+
+# Encode workers start as fresh interpreters: forking the multithreaded daemon can deadlock
+_ENCODE_MP_CONTEXT = multiprocessing.get_context("spawn")
+
+# Invalid filesystem characters become '-', spaces become '_'
+_CLEAN_TRANS = str.maketrans({**dict.fromkeys('<>:"/\\|?*&', '-'), ' ': '_'})
+
+
+def _compress_audio(source: str, destination: str, bitrate: str):
+    """Encode source to AAC at the given bitrate (e.g. '128k')"""
+    if av is None:
+        (
+            ffmpeg
+            .input(source)
+            .output(destination, acodec='aac', audio_bitrate=bitrate)
+            .overwrite_output()
+            .run(quiet=True)
+        )
+        return
+    
+    with av.open(source) as input_container, av.open(destination, 'w') as output_container:
+        input_stream = input_container.streams.audio[0]
+        output_stream = output_container.add_stream('aac', rate=input_stream.rate or 48000)
+        output_stream.bit_rate = int(bitrate.rstrip('k')) * 1000
+        
+        for frame in input_container.decode(input_stream):
+            # Let the encoder assign timestamps; it re-chunks frames to the AAC frame size
+            frame.pts = None
+            for packet in output_stream.encode(frame):
+                output_container.mux(packet)
+        
+        # Flush buffered samples
+        for packet in output_stream.encode(None):
+            output_container.mux(packet)
+
+
+def _link_or_copy(source, destination):
+    """Hardlink source to destination, copying when linking isn't possible (e.g. across filesystems)"""
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+def _file_digest(path: str) -> str:
+    """Hash a file's contents in 1 MiB chunks"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _compress_audio_cached(source: str, destination: str, bitrate: str, cache_dir: str):
+    """
+    Compress audio, reusing an earlier encode of identical source audio
+    
+    Encodes are hardlinked into cache_dir keyed by source digest and bitrate,
+    so a retried file becomes a link (or copy) instead of a re-encode.
+    """
+    cache_path = os.path.join(cache_dir, f"{_file_digest(source)}_{bitrate}.m4a")
+    
+    if os.path.exists(cache_path):
+        _link_or_copy(cache_path, destination)
+        return
+    
+    _compress_audio(source, destination, bitrate)
+    
+    try:
+        os.link(destination, cache_path)
+    except OSError:
+        # Another worker cached it first, or links aren't supported here
+        return
+    
+    # Keep only the most recent encodes
+    try:
+        with os.scandir(cache_dir) as entries:
+            cached = sorted(
+                (entry for entry in entries if entry.is_file() and entry.name.endswith('.m4a')),
+                key=lambda entry: entry.stat().st_mtime
+            )
+    except OSError:
+        # A concurrent worker pruned an entry mid-scan; the next encode prunes again
+        return
+    
+    for entry in cached[:-ENCODE_CACHE_ENTRIES]:
+        try:
+            os.unlink(entry.path)
+        except FileNotFoundError:
+            # A concurrent worker pruned the same entry
+            pass
+
+
 class FileOrganizer:
     """Handles file organization and output structure creation"""
     
-    def __init__(self, config: ProcessingConfig, dropbox_client=None, llm_service=None):
+    def __init__(self, config: ProcessingConfig, dropbox_client=None, llm_service=None, max_encode_workers: int = 4):
         self.config = config
         self.dropbox_client = dropbox_client
         self.llm_service = llm_service or 'unknown'
@@ -27,35 +141,72 @@ class FileOrganizer:
         self.output_root = Path("processed")
         self.output_root.mkdir(exist_ok=True)
         
+        # Completed encodes, keyed by source audio digest; other caches live beside this directory
+        self._cache_dir = self.output_root / ".cache" / "encodes"
+        self._cache_dir.mkdir(parents=True, exist_ok=True)
+        
+        # Resolve the compression bitrate once; the config is frozen
+        quality_settings = {
+            'low': '64k',
+            'medium': '128k',
+            'high': '192k'
+        }
+        self._audio_bitrate = quality_settings.get(config.compression_quality, '128k')
+        
+        # Audio encoding is CPU-bound, so it runs in worker processes; no more than
+        # the callers can have in flight, and no more than there are cores
+        self._encode_pool = ProcessPoolExecutor(
+            max_workers=max(1, min(max_encode_workers, os.cpu_count() or 1)),
+            mp_context=_ENCODE_MP_CONTEXT
+        )
+        atexit.register(self._encode_pool.shutdown)
+        
+        # Output workers run concurrently; picking a free folder name and renaming into it must not interleave
+        self._publish_lock = threading.Lock()
+        
         self.logger.info(f"File organizer initialized with output root: {self.output_root}")
     
     def create_output_folder(self, processed_content: Dict, audio_path: Path, transcript_data: Dict, file_created_time=None):
         """Create organized output folder with all processed files"""
+        # One timestamp for the whole session keeps the folder name, frontmatter and metadata consistent
+        now = datetime.now()
+        
         # Determine session date
-        session_date = self._get_session_date(processed_content, file_created_time)
+        session_date = self._get_session_date(processed_content, file_created_time, now)
         session_title = processed_content['session_title']
         
         # Create folder name
         folder_name = f"{session_date}_{session_title}"
         folder_name = self._clean_folder_name(folder_name)
         
-        output_folder = self.output_root / folder_name
-        output_folder.mkdir(exist_ok=True)
+        # Build everything in a private staging folder and rename it into place on success,
+        # so a partial folder never appears under the final name
+        staging_folder = Path(tempfile.mkdtemp(prefix=f".{folder_name}.", suffix=".tmp", dir=self.output_root))
+        output_folder = None
         
-        self.logger.info(f"Creating output folder: {output_folder}")
+        self.logger.info(f"Creating output folder: {self.output_root / folder_name}")
         
+        pending_audio = None
         try:
-            # Save compressed audio
-            self._save_compressed_audio(audio_path, output_folder, session_title)
+            # Start compressing audio; the text files are written while it encodes
+            pending_audio = self._save_compressed_audio(audio_path, staging_folder, session_title)
             
             # Save raw transcript
-            self._save_raw_transcript(transcript_data, output_folder)
+            self._save_raw_transcript(transcript_data, staging_folder)
             
             # Save processed content file with metadata
-            self._save_content_file(processed_content, output_folder, audio_path, transcript_data, file_created_time)
+            word_count = len(processed_content['content'].split())
+            self._save_content_file(processed_content, staging_folder, audio_path, transcript_data, file_created_time, now, word_count)
+            
+            # Metadata and upload need the finished audio file
+            self._wait_for_compressed_audio(pending_audio, audio_path, staging_folder)
             
             # Save metadata
-            self._save_metadata(processed_content, audio_path, transcript_data, output_folder)
+            self._save_metadata(processed_content, audio_path, transcript_data, staging_folder, now, word_count)
+            
+            # Publish the finished folder; a name already in use gets a numeric suffix
+            output_folder = self._publish_folder(staging_folder, folder_name)
+            folder_name = output_folder.name
             
             # Upload to Dropbox if client is available
             if self.dropbox_client:
@@ -70,28 +221,39 @@ class FileOrganizer:
             
         except Exception as e:
             self.logger.error(f"Failed to create output folder: {e}")
+            # Don't remove the folder while an encode is still writing into it
+            if pending_audio:
+                wait([pending_audio[0]])
             # Clean up partial folder
-            if output_folder.exists():
+            shutil.rmtree(staging_folder, ignore_errors=True)
+            if output_folder is not None and output_folder.exists():
                 shutil.rmtree(output_folder)
             raise e
     
-    def _get_session_date(self, processed_content: Dict, file_created_time=None) -> str:
+    def _publish_folder(self, staging_folder: Path, folder_name: str) -> Path:
+        """Rename a finished staging folder to folder_name, or folder_name_2, _3... if that is taken"""
+        with self._publish_lock:
+            output_folder = self.output_root / folder_name
+            suffix = 1
+            while output_folder.exists():
+                suffix += 1
+                output_folder = self.output_root / f"{folder_name}_{suffix}"
+            
+            os.rename(staging_folder, output_folder)
+        return output_folder
+    
+    def _get_session_date(self, processed_content: Dict, file_created_time=None, now: Optional[datetime] = None) -> str:
         """Get session date from file creation time only"""
         # Use file creation time if available, otherwise current time
         if file_created_time:
             return file_created_time.strftime('%Y-%m-%d_%H-%M')
         else:
-            return datetime.now().strftime('%Y-%m-%d_%H-%M')
+            return (now or datetime.now()).strftime('%Y-%m-%d_%H-%M')
     
     def _clean_folder_name(self, folder_name: str) -> str:
         """Clean folder name for filesystem compatibility"""
-        # Replace invalid characters
-        invalid_chars = '<>:"/\\|?*&'
-        for char in invalid_chars:
-            folder_name = folder_name.replace(char, '-')
-        
-        # Replace spaces with underscores
-        folder_name = folder_name.replace(' ', '_')
+        # Replace invalid characters and spaces in one pass
+        folder_name = folder_name.translate(_CLEAN_TRANS)
         
         # Limit length
         if len(folder_name) > 100:
@@ -99,8 +261,14 @@ class FileOrganizer:
         
         return folder_name
     
-    def _save_compressed_audio(self, audio_path: Path, output_folder: Path, session_title: str = None):
-        """Save compressed version of the original audio"""
+    def _save_compressed_audio(self, audio_path: Path, output_folder: Path, session_title: str = None) -> Optional[Tuple[Future, Path]]:
+        """
+        Save compressed version of the original audio
+        
+        Compression is submitted to the encode pool and runs in the background.
+        Pass the returned value to _wait_for_compressed_audio before relying on
+        the file; None means the audio was saved synchronously.
+        """
         # Create filename from session title if available
         if session_title:
             audio_filename = self._clean_filename(f"{session_title}.m4a" if self.config.compress_audio else f"{session_title}{audio_path.suffix}")
@@ -108,46 +276,39 @@ class FileOrganizer:
             audio_filename = "original_compressed.m4a" if self.config.compress_audio else f"original{audio_path.suffix}"
         
         if not self.config.compress_audio:
-            # Just copy the original file
+            # Just link (or copy) the original file; it is never modified afterwards
             output_path = output_folder / audio_filename
-            shutil.copy2(audio_path, output_path)
-            return
+            _link_or_copy(audio_path, output_path)
+            return None
         
-        # Compress audio using ffmpeg
+        # Compress audio in a worker process
         output_path = output_folder / audio_filename
         
+        future = self._encode_pool.submit(
+            _compress_audio_cached, str(audio_path), str(output_path), self._audio_bitrate, str(self._cache_dir)
+        )
+        return future, output_path
+    
+    def _wait_for_compressed_audio(self, pending: Optional[Tuple[Future, Path]], audio_path: Path, output_folder: Path):
+        """Wait for a background compression, copying the original if it failed"""
+        if pending is None:
+            return
+        
+        future, output_path = pending
+        
         try:
-            quality_settings = {
-                'low': '64k',
-                'medium': '128k',
-                'high': '192k'
-            }
-            
-            bitrate = quality_settings.get(self.config.compression_quality, '128k')
-            
-            (
-                ffmpeg
-                .input(str(audio_path))
-                .output(str(output_path), acodec='aac', audio_bitrate=bitrate)
-                .overwrite_output()
-                .run(quiet=True)
-            )
-            
+            future.result()
             self.logger.info(f"Compressed audio saved: {output_path.name}")
             
         except Exception as e:
             self.logger.warning(f"Audio compression failed, copying original: {e}")
             # Fall back to copying original
             output_path = output_folder / f"original{audio_path.suffix}"
-            shutil.copy2(audio_path, output_path)
+            _link_or_copy(audio_path, output_path)
     
     def _save_raw_transcript(self, transcript_data: Dict, output_folder: Path):
         """Save raw transcript as markdown"""
-        from .transcription import TranscriptionService
-        
-        # Create a temporary service instance to format the transcript
-        # This is a bit of a hack, but avoids duplicating the formatting logic
-        transcript_content = f"""# Raw Transcript
+        parts = [f"""# Raw Transcript
 
 **Duration:** {transcript_data.get('audio_duration', 'Unknown')} ms
 **Language:** {transcript_data.get('language_code', 'Unknown')}
@@ -156,27 +317,34 @@ class FileOrganizer:
 ## Transcript Text
 
 {transcript_data['text']}
-"""
+"""]
         
         # Add word-level timestamps if available
-        if transcript_data.get('words'):
-            transcript_content += "\n\n## Word-Level Timestamps\n\n"
-            transcript_content += "| Word | Start (ms) | End (ms) | Confidence |\n"
-            transcript_content += "|------|------------|----------|------------|\n"
+        words = transcript_data.get('words')
+        if words:
+            parts.append("\n\n## Word-Level Timestamps\n\n")
+            parts.append("| Word | Start (ms) | End (ms) | Confidence |\n")
+            parts.append("|------|------------|----------|------------|\n")
             
-            for word in transcript_data['words'][:50]:  # Limit to first 50 words
-                transcript_content += f"| {word['text']} | {word['start']} | {word['end']} | {word['confidence']:.2f} |\n"
+            # Words are stored column-wise; islice stops at the first 50 without copying the columns
+            rows = islice(zip(words['text'], words['start'], words['end'], words['confidence']), 50)
+            parts.extend(
+                f"| {text} | {start} | {end} | {confidence:.2f} |\n"
+                for text, start, end, confidence in rows
+            )
             
-            if len(transcript_data['words']) > 50:
-                transcript_content += "| ... | ... | ... | ... |\n"
+            if len(words['text']) > 50:
+                parts.append("| ... | ... | ... | ... |\n")
+        
+        # Join once rather than re-copying the growing string per row
+        transcript_content = ''.join(parts)
         
         output_path = output_folder / "transcript_raw.md"
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(transcript_content)
+        output_path.write_bytes(transcript_content.encode('utf-8'))
         
         self.logger.info("Raw transcript saved")
     
-    def _save_content_file(self, processed_content: Dict, output_folder: Path, audio_path: Path, transcript_data: Dict, file_created_time=None):
+    def _save_content_file(self, processed_content: Dict, output_folder: Path, audio_path: Path, transcript_data: Dict, file_created_time=None, now: Optional[datetime] = None, word_count: Optional[int] = None):
         """Save the processed content as a single markdown file with YAML frontmatter"""
         session_title = processed_content['session_title']
         content = processed_content['content']
@@ -184,7 +352,7 @@ class FileOrganizer:
         
         # Create YAML frontmatter
         frontmatter = self._create_yaml_frontmatter(
-            processed_content, audio_path, transcript_data, file_created_time
+            processed_content, audio_path, transcript_data, file_created_time, now, word_count
         )
         
         # Combine frontmatter and content
@@ -194,22 +362,23 @@ class FileOrganizer:
         filename = self._clean_filename(f"{session_title}.md")
         
         output_path = output_folder / filename
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(full_content)
+        output_path.write_bytes(full_content.encode('utf-8'))
         
         self.logger.info(f"Content file saved with metadata: {filename}")
     
-    def _create_yaml_frontmatter(self, processed_content: Dict, audio_path: Path, transcript_data: Dict, file_created_time=None) -> str:
+    def _create_yaml_frontmatter(self, processed_content: Dict, audio_path: Path, transcript_data: Dict, file_created_time=None, now: Optional[datetime] = None, word_count: Optional[int] = None) -> str:
         """Create YAML frontmatter for the markdown file"""
         import yaml
         
+        now = now or datetime.now()
+        
         # Use file creation time if available, otherwise current time
         if file_created_time:
             date_str = file_created_time.isoformat()
         else:
-            date_str = datetime.now().isoformat()
+            date_str = now.isoformat()
         
-        processed_date_str = datetime.now().isoformat()
+        processed_date_str = now.isoformat()
         
         # Calculate duration in seconds
         duration_seconds = 0
@@ -226,7 +395,7 @@ class FileOrganizer:
             'duration_seconds': duration_seconds,
             'llm_service': llm_service,
             'keywords': processed_content.get('keywords', []),
-            'word_count': len(processed_content['content'].split())
+            'word_count': word_count if word_count is not None else len(processed_content['content'].split())
         }
         
         # Create YAML frontmatter
@@ -235,13 +404,8 @@ class FileOrganizer:
     
     def _clean_filename(self, filename: str) -> str:
         """Clean filename for filesystem compatibility"""
-        # Remove invalid characters
-        invalid_chars = '<>:"/\\|?*&'
-        for char in invalid_chars:
-            filename = filename.replace(char, '-')
-        
-        # Replace spaces with underscores
-        filename = filename.replace(' ', '_')
+        # Replace invalid characters and spaces in one pass
+        filename = filename.translate(_CLEAN_TRANS)
         
         # Get file extension
         extension = Path(filename).suffix
@@ -253,7 +417,7 @@ class FileOrganizer:
         
         return name_part + extension
     
-    def _save_metadata(self, processed_content: Dict, audio_path: Path, transcript_data: Dict, output_folder: Path):
+    def _save_metadata(self, processed_content: Dict, audio_path: Path, transcript_data: Dict, output_folder: Path, now: Optional[datetime] = None, word_count: Optional[int] = None):
         """Save processing metadata as JSON"""
         try:
             original_size = audio_path.stat().st_size / (1024 * 1024)  # MB
@@ -261,16 +425,17 @@ class FileOrganizer:
             original_size = 0
         
         # Check for compressed file size
-        compressed_files = list(output_folder.glob("original_compressed.*"))
         compressed_size = 0
-        if compressed_files:
+        with os.scandir(output_folder) as entries:
+            compressed_file = next((entry for entry in entries if entry.name.startswith("original_compressed.")), None)
+        if compressed_file:
             try:
-                compressed_size = compressed_files[0].stat().st_size / (1024 * 1024)  # MB
+                compressed_size = compressed_file.stat().st_size / (1024 * 1024)  # MB
             except:
                 compressed_size = 0
         
         metadata = {
-            "processing_date": datetime.now().isoformat(),
+            "processing_date": (now or datetime.now()).isoformat(),
             "original_filename": audio_path.name,
             "session_title": processed_content['session_title'],
             "duration_seconds": transcript_data.get('audio_duration', 0) / 1000 if transcript_data.get('audio_duration') else 0,
@@ -279,12 +444,14 @@ class FileOrganizer:
             "transcription_service": "assemblyai",
             "llm_service": "configured_service",  # This could be passed from config
             "content_filename": self._clean_filename(f"{processed_content['session_title']}.md"),
-            "word_count": len(processed_content['content'].split())
+            "word_count": word_count if word_count is not None else len(processed_content['content'].split())
         }
         
         output_path = output_folder / "metadata.json"
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(metadata, f, indent=2, ensure_ascii=False)
+        if orjson is not None:
+            output_path.write_bytes(orjson.dumps(metadata, option=orjson.OPT_INDENT_2))
+        else:
+            output_path.write_bytes(json.dumps(metadata, indent=2, ensure_ascii=False).encode('utf-8'))
         
         self.logger.info("Metadata saved")
     
@@ -292,17 +459,20 @@ class FileOrganizer:
         """Upload all files in local folder to Dropbox processed folder"""
         self.logger.info(f"Uploading folder to Dropbox: {folder_name}")
         
-        # Upload all files in the folder
-        for file_path in local_folder.iterdir():
-            if file_path.is_file():
-                # Create Dropbox path
-                dropbox_path = f"{self.dropbox_client.config.root_folder}/processed/{folder_name}/{file_path.name}"
-                
-                try:
-                    self.dropbox_client.upload_to_processed(file_path, dropbox_path)
-                    self.logger.info(f"Uploaded: {file_path.name}")
-                except Exception as e:
-                    self.logger.error(f"Failed to upload {file_path.name}: {e}")
-                    raise e
+        uploads = []
+        with os.scandir(local_folder) as entries:
+            for entry in entries:
+                # DirEntry caches the file type from the directory read, avoiding a stat per file
+                if entry.is_file(follow_symlinks=False):
+                    # Create Dropbox path
+                    dropbox_path = f"{self.dropbox_client.processed_prefix}{folder_name}/{entry.name}"
+                    uploads.append((Path(entry.path), dropbox_path))
+        
+        # Small files are committed as one batch; the audio file streams alongside them
+        try:
+            self.dropbox_client.upload_many_to_processed(uploads)
+        except Exception as e:
+            self.logger.error(f"Failed to upload {folder_name}: {e}")
+            raise
         
         self.logger.info(f"Successfully uploaded all files for: {folder_name}")
\ No newline at end of file
@@ -2,15 +2,142 @@
 LLM processing service for content enhancement and topic separation
 """
 
+import atexit
+import hashlib
 import json
 import logging
+import sqlite3
+import threading
+import time
+from dataclasses import replace
 from datetime import datetime
-from typing import Dict, List, Optional
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, TypedDict
 
-import openai
-from anthropic import Anthropic
+try:
+    # Optional: orjson parses clean responses several times faster than stdlib json
+    from orjson import loads as _json_loads
+except ImportError:
+    _json_loads = json.loads
 
 from .config import LLMConfig
+from .error_handler import CircuitBreaker
+
+
+# One connection pool per SDK, shared by all of its clients so TLS sessions are reused across calls
+_SHARED_HTTP: Dict[str, object] = {}
+_SHARED_HTTP_LOCK = threading.Lock()
+
+
+def _shared_http_client(sdk):
+    """
+    Return the pooled HTTP client for an SDK module (openai or anthropic)
+    
+    Built with the SDK's DefaultHttpxClient, which keeps its timeout and
+    redirect defaults and matches the HTTP library the SDK was built against.
+    """
+    with _SHARED_HTTP_LOCK:
+        client = _SHARED_HTTP.get(sdk.__name__)
+        if client is None:
+            # Keep idle connections for a minute so back-to-back memos skip the TLS handshake;
+            # the Limits type comes from the SDK so it matches its HTTP library
+            limits = type(sdk.DEFAULT_CONNECTION_LIMITS)(
+                max_connections=32, max_keepalive_connections=20, keepalive_expiry=60.0
+            )
+            client = sdk.DefaultHttpxClient(limits=limits)
+            atexit.register(client.close)
+            _SHARED_HTTP[sdk.__name__] = client
+        return client
+
+
+# Sent unchanged on every request, ahead of the user turn
+_SYSTEM_PROMPT = "You are an expert at processing voice memos into structured, actionable content. Always respond with valid JSON."
+
+# Static prompt text around the transcript, so each call is a single join
+_PROMPT_HEADER = """Process this voice memo transcript into a single, organized document:
+
+ORIGINAL TRANSCRIPT:
+"""
+
+_PROMPT_FOOTER = """
+
+Please:
+1. **DENSIFY**: Remove filler words, repetition, and tangents
+2. **STRUCTURE**: Organize content with clear headings and make it easily scannable and actionable
+3. **PRESERVE FLOW**: Keep the natural flow of topics but organize them clearly
+4. Create overall session title
+5. **EXTRACT KEYWORDS**: Identify 3-8 key topics, themes, or subjects discussed
+
+Format response as JSON:
+{
+  "session_title": "descriptive-session-title",
+  "keywords": ["keyword1", "keyword2", "keyword3"],
+  "content": "# Session Title\n\nWell-structured markdown content with headings, organized thoughts, and actionable items"
+}
+
+Ensure the JSON is valid and properly formatted."""
+
+_DECODER = json.JSONDecoder()
+
+
+class ProcessedContent(TypedDict):
+    """Validated LLM output, as returned by _parse_response"""
+    session_title: str
+    keywords: List[str]
+    content: str
+
+
+RESPONSE_CACHE_PATH = Path("processed") / ".cache" / "llm" / "llm_responses.db"
+
+# Seconds between status checks while a provider batch is running
+BATCH_POLL_INTERVAL = 30
+
+# Output token budget bounds; see _max_output_tokens
+MIN_OUTPUT_TOKENS = 1024
+MAX_OUTPUT_TOKENS = 8000
+
+_CLEAN_TRANS = str.maketrans(dict.fromkeys('<>:"/\\|?*', '-'))
+
+
+def _max_output_tokens(prompt: str) -> int:
+    """
+    Scale the output budget to the prompt size
+    
+    The densified content is shorter than the transcript it comes from. At roughly
+    4 characters per token, len // 3 leaves about 1.3x the prompt's tokens of headroom.
+    """
+    return max(MIN_OUTPUT_TOKENS, min(MAX_OUTPUT_TOKENS, len(prompt) // 3))
+
+
+class ResponseCache:
+    """SQLite-backed store of raw LLM responses keyed by model and prompt"""
+    
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # One connection shared by the file workers; the lock serializes access
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT NOT NULL)")
+    
+    @staticmethod
+    def make_key(model: str, prompt: str) -> str:
+        """Hash the model and prompt into a cache key"""
+        digest = hashlib.sha256(model.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(prompt.encode('utf-8'))
+        return digest.hexdigest()
+    
+    def get(self, key: str) -> Optional[str]:
+        """Return the stored response for key, if any"""
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+    
+    def set(self, key: str, response: str):
+        """Store a response under key"""
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO responses (key, response) VALUES (?, ?)", (key, response))
 
 
 class LLMProcessor:
@@ -20,35 +147,68 @@ class LLMProcessor:
         self.config = config
         self.logger = logging.getLogger(__name__)
         
+        # SDKs are imported on demand so only the configured provider's is loaded
         if config.service == "openai":
-            self.client = openai.OpenAI(api_key=config.api_key)
+            import openai
+            self.client = openai.OpenAI(api_key=config.api_key, http_client=_shared_http_client(openai))
         elif config.service == "openrouter":
+            import openai
             self.client = openai.OpenAI(
                 base_url="https://openrouter.ai/api/v1",
-                api_key=config.api_key
+                api_key=config.api_key,
+                http_client=_shared_http_client(openai)
             )
         elif config.service == "claude":
-            self.client = Anthropic(api_key=config.api_key)
+            import anthropic
+            self.client = anthropic.Anthropic(api_key=config.api_key, http_client=_shared_http_client(anthropic))
         else:
             raise ValueError(f"Unsupported LLM service: {config.service}")
         
+        if config.cache_mode == "exact":
+            self.cache = ResponseCache(RESPONSE_CACHE_PATH)
+        elif config.cache_mode == "off":
+            self.cache = None
+        else:
+            raise ValueError(f"Unsupported LLM cache mode: {config.cache_mode}")
+        
         self.logger.info(f"Initialized {config.service} LLM processor")
     
-    def process_transcript(self, transcript_data: Dict, file_created_time: Optional[datetime] = None) -> Dict:
-        """Process transcript through LLM for enhancement and topic separation"""
-        self.logger.info("Processing transcript with LLM")
+    def process_transcript(self, transcript_data: Dict, file_created_time: Optional[datetime] = None, model: Optional[str] = None) -> ProcessedContent:
+        """
+        Process transcript through LLM for enhancement and topic separation
+        
+        Args:
+            transcript_data: Transcript returned by TranscriptionService
+            file_created_time: Recording time of the source file, if known
+            model: Model to use instead of the configured one (e.g. a fallback)
+        """
+        model = model or self.config.model
+        self.logger.info(f"Processing transcript with LLM ({model})")
         
         prompt = self._build_prompt(transcript_data['text'], file_created_time)
         
+        # Reprocessing an identical transcript (e.g. a retried file) reuses the earlier response
+        cache_key = ResponseCache.make_key(model, prompt) if self.cache else None
+        if cache_key:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                self.logger.info("Using cached LLM response")
+                return self._parse_response(cached)
+        
         try:
             if self.config.service in ["openai", "openrouter"]:
-                response = self._process_with_openai(prompt)
+                response = self._process_with_openai(prompt, model)
             elif self.config.service == "claude":
-                response = self._process_with_claude(prompt)
+                response = self._process_with_claude(prompt, model)
             else:
                 raise ValueError(f"Unsupported service: {self.config.service}")
             
             processed_content = self._parse_response(response)
+            
+            # Only responses that parsed are worth keeping
+            if cache_key:
+                self.cache.set(cache_key, response)
+            
             content_length = len(processed_content['content'])
             self.logger.info(f"LLM processing completed: {content_length} characters of organized content")
             
@@ -60,74 +220,210 @@ class LLMProcessor:
     
     def _build_prompt(self, transcript_text: str, file_created_time: Optional[datetime] = None) -> str:
         """Build the prompt for LLM processing"""
-        return f"""Process this voice memo transcript into a single, organized document:
-
-ORIGINAL TRANSCRIPT:
-{transcript_text}
-
-Please:
-1. **DENSIFY**: Remove filler words, repetition, and tangents
-2. **STRUCTURE**: Organize content with clear headings and make it easily scannable and actionable
-3. **PRESERVE FLOW**: Keep the natural flow of topics but organize them clearly
-4. Create overall session title
-5. **EXTRACT KEYWORDS**: Identify 3-8 key topics, themes, or subjects discussed
-
-Format response as JSON:
-{{
-  "session_title": "descriptive-session-title",
-  "keywords": ["keyword1", "keyword2", "keyword3"],
-  "content": "# Session Title\n\nWell-structured markdown content with headings, organized thoughts, and actionable items"
-}}
-
-Ensure the JSON is valid and properly formatted."""
+        return ''.join((_PROMPT_HEADER, transcript_text, _PROMPT_FOOTER))
     
-    def _process_with_openai(self, prompt: str) -> str:
-        """Process prompt with OpenAI API"""
-        response = self.client.chat.completions.create(
-            model=self.config.model,
-            messages=[
-                {"role": "system", "content": "You are an expert at processing voice memos into structured, actionable content. Always respond with valid JSON."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.5,
-            max_tokens=8000
+    @property
+    def supports_batch(self) -> bool:
+        """Whether the configured service offers a batch API"""
+        return self.config.service in ("openai", "claude")
+    
+    def process_transcripts_batch(self, transcripts: Dict[str, Tuple[Dict, Optional[datetime]]]) -> Dict[str, ProcessedContent]:
+        """
+        Process several transcripts through the provider's batch API
+        
+        Batches are billed at half price but can take minutes to hours to
+        complete, so this suits backlogs rather than single memos. A batch
+        still running after config.batch_timeout seconds is cancelled and
+        TimeoutError is raised.
+        
+        Args:
+            transcripts: Mapping of request ID to (transcript_data, file_created_time);
+                IDs may only contain letters, digits, '-' and '_'
+            
+        Returns:
+            Mapping of request ID to processed content; requests that failed are omitted
+        """
+        if not self.supports_batch:
+            raise ValueError(f"Batch processing is not supported for: {self.config.service}")
+        
+        results = {}
+        prompts = {}
+        for request_id, (transcript_data, file_created_time) in transcripts.items():
+            prompt = self._build_prompt(transcript_data['text'], file_created_time)
+            cached = self.cache.get(ResponseCache.make_key(self.config.model, prompt)) if self.cache else None
+            if cached is not None:
+                results[request_id] = self._parse_response(cached)
+            else:
+                prompts[request_id] = prompt
+        
+        if not prompts:
+            return results
+        
+        self.logger.info(f"Submitting {len(prompts)} transcripts as a {self.config.service} batch")
+        
+        if self.config.service == "openai":
+            responses = self._run_openai_batch(prompts)
+        else:
+            responses = self._run_claude_batch(prompts)
+        
+        for request_id, response in responses.items():
+            try:
+                results[request_id] = self._parse_response(response)
+            except ValueError as e:
+                self.logger.error(f"Batch request {request_id} returned an invalid response: {e}")
+                continue
+            if self.cache:
+                self.cache.set(ResponseCache.make_key(self.config.model, prompts[request_id]), response)
+        
+        self.logger.info(f"Batch completed: {len(results)} of {len(transcripts)} transcripts processed")
+        return results
+    
+    def _run_openai_batch(self, prompts: Dict[str, str]) -> Dict[str, str]:
+        """Submit prompts to the OpenAI Batch API and wait for the response texts"""
+        lines = [
+            json.dumps({
+                "custom_id": request_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": self._openai_params(prompt)
+            })
+            for request_id, prompt in prompts.items()
+        ]
+        batch_file = self.client.files.create(
+            file=("batch.jsonl", "\n".join(lines).encode('utf-8')),
+            purpose="batch"
+        )
+        batch = self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
         )
         
-        return response.choices[0].message.content
+        deadline = time.monotonic() + self.config.batch_timeout
+        while batch.status in ("validating", "in_progress", "finalizing"):
+            if time.monotonic() >= deadline:
+                self._cancel_batch(self.client.batches.cancel, batch.id)
+            time.sleep(BATCH_POLL_INTERVAL)
+            batch = self.client.batches.retrieve(batch.id)
+        
+        if batch.status != "completed":
+            raise Exception(f"Batch {batch.id} ended with status: {batch.status}")
+        
+        responses = {}
+        if batch.output_file_id:
+            for line in self.client.files.content(batch.output_file_id).text.splitlines():
+                item = json.loads(line)
+                response = item.get('response')
+                if response and response.get('status_code') == 200:
+                    responses[item['custom_id']] = response['body']['choices'][0]['message']['content']
+                else:
+                    self.logger.error(f"Batch request {item['custom_id']} failed: {item.get('error')}")
+        return responses
     
-    def _process_with_claude(self, prompt: str) -> str:
-        """Process prompt with Anthropic Claude API"""
-        response = self.client.messages.create(
-            model=self.config.model,
-            max_tokens=8000,
-            temperature=0.5,
-            system="You are an expert at processing voice memos into structured, actionable content. Always respond with valid JSON.",
-            messages=[
-                {"role": "user", "content": prompt}
+    def _run_claude_batch(self, prompts: Dict[str, str]) -> Dict[str, str]:
+        """Submit prompts to the Anthropic Message Batches API and wait for the response texts"""
+        batch = self.client.messages.batches.create(
+            requests=[
+                {"custom_id": request_id, "params": self._claude_params(prompt)}
+                for request_id, prompt in prompts.items()
             ]
         )
         
-        return response.content[0].text
+        deadline = time.monotonic() + self.config.batch_timeout
+        while batch.processing_status != "ended":
+            if time.monotonic() >= deadline:
+                self._cancel_batch(self.client.messages.batches.cancel, batch.id)
+            time.sleep(BATCH_POLL_INTERVAL)
+            batch = self.client.messages.batches.retrieve(batch.id)
+        
+        responses = {}
+        for item in self.client.messages.batches.results(batch.id):
+            if item.result.type == "succeeded":
+                responses[item.custom_id] = item.result.message.content[0].text
+            else:
+                self.logger.error(f"Batch request {item.custom_id} failed: {item.result.type}")
+        return responses
+    
+    def _cancel_batch(self, cancel, batch_id: str):
+        """Cancel a batch that outlived batch_timeout and raise TimeoutError"""
+        try:
+            cancel(batch_id)
+        except Exception as e:
+            self.logger.warning(f"Failed to cancel batch {batch_id}: {e}")
+        raise TimeoutError(f"Batch {batch_id} did not finish within {self.config.batch_timeout}s")
     
-    def _parse_response(self, response: str) -> Dict:
+    def _openai_params(self, prompt: str, model: Optional[str] = None) -> Dict:
+        """Chat completion parameters shared by the streaming and batch paths"""
+        params = {
+            "model": model or self.config.model,
+            "messages": [
+                {"role": "system", "content": _SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": 0.5,
+            "max_tokens": _max_output_tokens(prompt)
+        }
+        if self.config.service == "openai":
+            # JSON mode guarantees a bare object; OpenRouter support varies by model
+            params["response_format"] = {"type": "json_object"}
+        return params
+    
+    def _claude_params(self, prompt: str, model: Optional[str] = None) -> Dict:
+        """Messages API parameters shared by the streaming and batch paths"""
+        return {
+            "model": model or self.config.model,
+            "max_tokens": _max_output_tokens(prompt),
+            "temperature": 0.5,
+            "system": _SYSTEM_PROMPT,
+            "messages": [
+                {"role": "user", "content": prompt}
+            ]
+        }
+    
+    def _process_with_openai(self, prompt: str, model: Optional[str] = None) -> str:
+        """Process prompt with OpenAI API"""
+        response = self.client.chat.completions.create(**self._openai_params(prompt, model), stream=True)
+        
+        # Collect streamed deltas as they arrive instead of waiting on one large body
+        parts = []
+        for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+        
+        return ''.join(parts)
+    
+    def _process_with_claude(self, prompt: str, model: Optional[str] = None) -> str:
+        """Process prompt with Anthropic Claude API"""
+        with self.client.messages.stream(**self._claude_params(prompt, model)) as stream:
+            return ''.join(stream.text_stream)
+    
+    def _parse_response(self, response: str) -> ProcessedContent:
         """Parse and validate LLM response"""
         try:
-            # Try to extract JSON from response (in case there's extra text)
-            start_idx = response.find('{')
-            end_idx = response.rfind('}') + 1
+            try:
+                # Clean responses (e.g. OpenAI JSON mode) parse directly without scanning
+                parsed = _json_loads(response)
+            except json.JSONDecodeError:
+                parsed = None
             
-            if start_idx == -1 or end_idx == 0:
-                raise ValueError("No JSON found in response")
+            if not isinstance(parsed, dict):
+                # Try to extract JSON from response (in case there's extra text)
+                start_idx = response.find('{')
+                
+                if start_idx == -1:
+                    raise ValueError("No JSON found in response")
+                
+                # Decode in place from the first brace; trailing text is ignored
+                parsed, _ = _DECODER.raw_decode(response, start_idx)
             
-            json_str = response[start_idx:end_idx]
-            parsed = json.loads(json_str)
-            
-            # Validate structure
-            required_fields = ['session_title', 'keywords', 'content']
-            for field in required_fields:
+            # Validate structure against ProcessedContent
+            for field in ProcessedContent.__annotations__:
                 if field not in parsed:
                     raise ValueError(f"Missing required field: {field}")
             
+            if not isinstance(parsed['session_title'], str):
+                raise ValueError("Session title must be a string")
+            
             if not isinstance(parsed['content'], str) or len(parsed['content'].strip()) == 0:
                 raise ValueError("Content must be a non-empty string")
             
@@ -144,9 +440,7 @@ Ensure the JSON is valid and properly formatted."""
     def _clean_filename(self, filename: str) -> str:
         """Clean and validate filename"""
         # Remove invalid characters
-        invalid_chars = '<>:"/\\|?*'
-        for char in invalid_chars:
-            filename = filename.replace(char, '-')
+        filename = filename.translate(_CLEAN_TRANS)
         
         # Limit length
         if len(filename) > 40:
@@ -156,4 +450,66 @@ Ensure the JSON is valid and properly formatted."""
         if not filename.endswith('.md'):
             filename += '.md'
         
-        return filename
\ No newline at end of file
+        return filename
+
+
+class LLMPool:
+    """
+    Spreads LLM calls over several endpoints with automatic failover
+    
+    Each endpoint is an LLMProcessor with its own circuit breaker. Calls go to the
+    healthy endpoint with the fewest requests in flight and move on to the next one
+    when it fails, so a single provider outage or rate limit doesn't stall processing.
+    """
+    
+    def __init__(self, config: LLMConfig):
+        self.config = config
+        self.logger = logging.getLogger(__name__)
+        
+        self.members = [LLMProcessor(config)] + [
+            LLMProcessor(replace(config, service=endpoint.service, api_key=endpoint.api_key, model=endpoint.model, endpoints=()))
+            for endpoint in config.endpoints
+        ]
+        self.breakers = [CircuitBreaker(failure_threshold=3, recovery_timeout=180) for _ in self.members]
+        self._inflight = [0] * len(self.members)
+        self._lock = threading.Lock()
+        
+        self.logger.info(f"Initialized LLM pool with {len(self.members)} endpoints")
+    
+    @property
+    def supports_batch(self) -> bool:
+        """Batches always go to the primary endpoint"""
+        return self.members[0].supports_batch
+    
+    def process_transcripts_batch(self, transcripts: Dict[str, Tuple[Dict, Optional[datetime]]]) -> Dict[str, ProcessedContent]:
+        """Process several transcripts through the primary endpoint's batch API"""
+        return self.members[0].process_transcripts_batch(transcripts)
+    
+    def process_transcript(self, transcript_data: Dict, file_created_time: Optional[datetime] = None, model: Optional[str] = None) -> ProcessedContent:
+        """Process a transcript on the least-loaded healthy endpoint, failing over on errors"""
+        if model:
+            # A model override names a model of the primary service
+            return self.members[0].process_transcript(transcript_data, file_created_time, model=model)
+        
+        with self._lock:
+            order = sorted(
+                range(len(self.members)),
+                # An open breaker whose cooldown has passed gets its trial call like a healthy endpoint
+                key=lambda i: (not self.breakers[i].allows_call(), self._inflight[i], i)
+            )
+        
+        last_error = None
+        for i in order:
+            member = self.members[i]
+            with self._lock:
+                self._inflight[i] += 1
+            try:
+                return self.breakers[i].call(member.process_transcript, transcript_data, file_created_time)
+            except Exception as e:
+                last_error = e
+                self.logger.warning(f"LLM endpoint {member.config.service}/{member.config.model} failed: {e}")
+            finally:
+                with self._lock:
+                    self._inflight[i] -= 1
+        
+        raise last_error
\ No newline at end of file
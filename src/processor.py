@@ -3,15 +3,25 @@ Main voice memo processing logic
 """
 
 import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 from pathlib import Path
-from typing import List
+from typing import Dict, List, Optional, Tuple
 
 from .config import Config
 from .dropbox_client import DropboxClient
-from .transcription import TranscriptionService
-from .llm_processor import LLMProcessor
+from .transcription import TRANSCRIPT_CHECKPOINT_DIR, TranscriptCheckpoints, TranscriptionService
+from .llm_processor import LLMPool, LLMProcessor
 from .file_organizer import FileOrganizer
-from .error_handler import ErrorHandler, CircuitBreaker, retry_on_failure
+from .error_handler import ErrorHandler, CircuitBreaker, CircuitOpenError, retry_on_failure
+
+
+# Worker limits per pipeline stage; each stage mostly waits on a different remote
+# service, so files flow through them concurrently
+MAX_CONCURRENT_TRANSCRIPTIONS = 4
+MAX_CONCURRENT_LLM_CALLS = 2
+MAX_CONCURRENT_OUTPUTS = 4
 
 
 class VoiceMemoProcessor:
@@ -23,36 +33,252 @@ class VoiceMemoProcessor:
         
         self.dropbox = DropboxClient(config.dropbox)
         self.transcription = TranscriptionService(config.transcription)
-        self.llm = LLMProcessor(config.llm)
-        self.organizer = FileOrganizer(config.processing, self.dropbox, config.llm.service)
+        self.transcript_checkpoints = TranscriptCheckpoints(TRANSCRIPT_CHECKPOINT_DIR)
+        self.llm = LLMPool(config.llm) if config.llm.endpoints else LLMProcessor(config.llm)
+        self.organizer = FileOrganizer(
+            config.processing, self.dropbox, config.llm.service, max_encode_workers=MAX_CONCURRENT_OUTPUTS
+        )
+        
+        # Set on shutdown to cut short retry waits in the worker threads
+        self.stop_event = threading.Event()
         
         # Error handling
-        self.error_handler = ErrorHandler(max_retries=3, base_delay=2.0)
+        self.error_handler = ErrorHandler(max_retries=3, base_delay=2.0, stop_event=self.stop_event)
         self.transcription_breaker = CircuitBreaker(failure_threshold=5, recovery_timeout=300)
         self.llm_breaker = CircuitBreaker(failure_threshold=3, recovery_timeout=180)
+        
+        # Inbox cursor used for longpoll change detection
+        self._inbox_cursor: Optional[str] = None
     
     def process_inbox(self):
         """Process all files in the inbox folder"""
         try:
-            files = self.dropbox.list_inbox_files()
+            if self._inbox_cursor is None:
+                # Full listing; take the cursor first so files landing mid-run still show up as changes
+                self._inbox_cursor = self.dropbox.get_inbox_cursor()
+                files = self.dropbox.list_inbox_files()
+            else:
+                # Only fetch what changed since the last run
+                files, self._inbox_cursor = self.dropbox.list_inbox_changes(self._inbox_cursor)
             
             if not files:
                 return
             
             self.logger.info(f"Found {len(files)} files to process")
             
-            for file_info in files:
-                try:
-                    self._process_single_file(file_info)
-                except Exception as e:
-                    self.logger.error(f"Failed to process {file_info['name']}: {e}")
-                    self.dropbox.move_to_failed(file_info)
-                    
+            batch_threshold = self.config.llm.batch_threshold
+            if batch_threshold and len(files) >= batch_threshold and self.llm.supports_batch:
+                self._process_batch(files)
+                return
+            
+            self._process_pipeline(files)
+            
         except Exception as e:
             self.logger.error(f"Error checking inbox: {e}")
+            # Resync with a full listing next time
+            self._inbox_cursor = None
+    
+    def wait_for_changes(self, timeout: int = 480) -> bool:
+        """
+        Wait until the inbox changes since the last process_inbox() call
+        
+        Falls back to sleeping for the polling interval if no cursor is
+        available or the longpoll request fails.
+        
+        Args:
+            timeout: Maximum seconds to block on the Dropbox longpoll endpoint
+            
+        Returns:
+            True if changes were detected (or may have occurred), False on timeout
+        """
+        if self._inbox_cursor is None:
+            time.sleep(self.config.processing.polling_interval)
+            return True
+        
+        try:
+            changed = self.dropbox.wait_for_inbox_changes(self._inbox_cursor, timeout=timeout)
+        except Exception as e:
+            self.logger.warning(f"Longpoll failed, falling back to polling: {e}")
+            time.sleep(self.config.processing.polling_interval)
+            changed = True
+            # The cursor may have been invalidated; resync with a full listing
+            self._inbox_cursor = None
+        
+        if not changed:
+            # Idle timeout: do a full listing next run to pick up anything a delta missed
+            self._inbox_cursor = None
+        return changed
+    
+    def _process_pipeline(self, files: List[dict]):
+        """
+        Run files through the transcription, LLM and output stages
+        
+        Each stage has its own worker pool and a file moves on as soon as it
+        finishes the previous stage, so transcribing one memo overlaps the LLM
+        call and upload of others.
+        """
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_TRANSCRIPTIONS) as transcribe_pool, \
+                ThreadPoolExecutor(max_workers=MAX_CONCURRENT_LLM_CALLS) as llm_pool, \
+                ThreadPoolExecutor(max_workers=MAX_CONCURRENT_OUTPUTS) as output_pool:
+            # future -> (stage, file_info, transcription stage result)
+            pending = {
+                transcribe_pool.submit(self._transcribe_file, file_info): ("transcribe", file_info, None)
+                for file_info in files
+            }
+            
+            try:
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    
+                    for future in done:
+                        stage, file_info, staged = pending.pop(future)
+                        try:
+                            result = future.result()
+                        except Exception as e:
+                            self.logger.error(f"Failed to process {file_info['name']}: {e}")
+                            if stage == "transcribe":
+                                # The file may not have made it out of the inbox
+                                self.dropbox.move_to_failed(file_info)
+                            continue
+                        
+                        if stage == "transcribe" and result is not None:
+                            future = llm_pool.submit(self._summarize_file, file_info, result)
+                            pending[future] = ("llm", file_info, result)
+                        elif stage == "llm":
+                            future = output_pool.submit(self._organize_file, file_info, *staged, result)
+                            pending[future] = ("output", file_info, staged)
+            except KeyboardInterrupt:
+                # Leaving the pools waits for their workers, so stop them retrying first
+                self.stop_event.set()
+                raise
+    
+    def _summarize_file(self, file_info: dict, staged: Tuple[str, Path, Dict]) -> Dict:
+        """Run the LLM stage for a transcribed file, moving it to failed if that fails"""
+        processing_path, _, transcript = staged
+        
+        try:
+            return self._process_with_llm(file_info, transcript)
+        except Exception as e:
+            # Move back to failed if processing fails
+            self.dropbox.move_to_failed_from_processing(processing_path)
+            raise e
+    
+    def _process_with_llm(self, file_info: dict, transcript: Dict) -> Dict:
+        """
+        Run the LLM stage, degrading gracefully when a fallback model is configured
+        
+        If the primary model fails (or its circuit breaker is open), the fallback
+        model is tried once; if that fails too, the raw transcript is kept as the
+        content so the memo is still delivered rather than moved to failed.
+        """
+        created_time = file_info.get('created_time')
+        
+        try:
+            # Process with LLM with circuit breaker and retry
+            return self.llm_breaker.call(
+                self.error_handler.retry_with_backoff,
+                self.llm.process_transcript,
+                transcript,
+                created_time,
+                max_retries=2
+            )
+        except Exception as e:
+            fallback_model = self.config.llm.fallback_model
+            if not fallback_model or self.stop_event.is_set():
+                raise
+            
+            reason = "circuit breaker is open" if isinstance(e, CircuitOpenError) else str(e)
+            self.logger.warning(f"LLM processing failed for {file_info['name']} ({reason}), trying fallback model {fallback_model}")
+        
+        try:
+            return self.llm.process_transcript(transcript, created_time, model=fallback_model)
+        except Exception as e:
+            self.logger.error(f"Fallback model failed for {file_info['name']}: {e}; keeping the raw transcript")
+        
+        return {
+            'session_title': Path(file_info['name']).stem,
+            'keywords': [],
+            'content': f"# Raw Transcript\n\n{transcript['text']}"
+        }
     
-    def _process_single_file(self, file_info: dict):
-        """Process a single voice memo file through the complete pipeline"""
+    def _process_batch(self, files: List[dict]):
+        """Transcribe files concurrently, then send all of their LLM requests as one provider batch"""
+        self.logger.info(f"Processing {len(files)} files through the {self.config.llm.service} batch API")
+        
+        staged = {}
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_TRANSCRIPTIONS) as executor:
+            futures = {executor.submit(self._transcribe_file, file_info): file_info for file_info in files}
+            
+            try:
+                for future in as_completed(futures):
+                    file_info = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        self.logger.error(f"Failed to process {file_info['name']}: {e}")
+                        self.dropbox.move_to_failed(file_info)
+                        continue
+                    if result is not None:
+                        # Batch IDs must be short and alphanumeric, so index rather than use filenames
+                        staged[f"memo-{len(staged)}"] = (file_info, *result)
+            except KeyboardInterrupt:
+                # Leaving the pool waits for its workers, so stop them retrying first
+                self.stop_event.set()
+                raise
+        
+        if not staged:
+            return
+        
+        try:
+            results = self.llm_breaker.call(
+                self.llm.process_transcripts_batch,
+                {request_id: (transcript, file_info.get('created_time'))
+                 for request_id, (file_info, _, _, transcript) in staged.items()}
+            )
+        except Exception as e:
+            self.logger.error(f"LLM batch failed: {e}")
+            results = {}
+        
+        # Anything the batch didn't deliver goes through the usual per-file LLM path and its fallbacks
+        unfinished = {request_id: item for request_id, item in staged.items() if request_id not in results}
+        if unfinished:
+            self.logger.warning(f"No batch result for {len(unfinished)} files; processing them individually")
+            with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_LLM_CALLS) as executor:
+                futures = {
+                    executor.submit(self._summarize_file, file_info, staged_file): request_id
+                    for request_id, (file_info, *staged_file) in unfinished.items()
+                }
+                for future in as_completed(futures):
+                    request_id = futures[future]
+                    try:
+                        results[request_id] = future.result()
+                    except Exception as e:
+                        self.logger.error(f"Failed to process {staged[request_id][0]['name']}: {e}")
+        
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_OUTPUTS) as executor:
+            futures = {}
+            for request_id, (file_info, processing_path, local_path, transcript) in staged.items():
+                if request_id not in results:
+                    # Already moved to failed by _summarize_file
+                    continue
+                future = executor.submit(
+                    self._organize_file, file_info, processing_path, local_path, transcript, results[request_id]
+                )
+                futures[future] = file_info
+            
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    self.logger.error(f"Failed to process {futures[future]['name']}: {e}")
+    
+    def _transcribe_file(self, file_info: dict) -> Optional[Tuple[str, Path, Dict]]:
+        """
+        Claim, download and transcribe one inbox file
+        
+        Returns:
+            (processing_path, local_path, transcript), or None if the file was skipped
+        """
         filename = file_info['name']
         self.logger.info(f"Processing: {filename}")
         
@@ -60,35 +286,50 @@ class VoiceMemoProcessor:
         processing_path = self.dropbox.move_to_processing(file_info)
         
         try:
-            # Download file for processing
-            local_path = self.dropbox.download_file(processing_path, filename)
-            
-            # Check if file is too small (likely accidental recording)
-            file_size_kb = local_path.stat().st_size / 1024
+            # Check if file is too small (likely accidental recording); the listing has the size, so no download is needed
+            file_size_kb = file_info['size'] / 1024
             if file_size_kb < self.config.processing.min_file_size_kb:
                 self.logger.info(f"Skipping {filename}: file too small ({file_size_kb:.1f}KB < {self.config.processing.min_file_size_kb}KB)")
                 # Clean up files
                 self.dropbox.delete_processing_file(processing_path)
-                local_path.unlink()
-                return
+                return None
             
-            # Transcribe audio with circuit breaker and retry
-            transcript = self.transcription_breaker.call(
-                self.error_handler.retry_with_backoff,
-                self.transcription.transcribe,
-                local_path,
-                max_retries=3
-            )
+            # Download file for processing
+            local_path = self.dropbox.download_file(processing_path, filename)
             
-            # Process with LLM with circuit breaker and retry
-            processed_content = self.llm_breaker.call(
-                self.error_handler.retry_with_backoff,
-                self.llm.process_transcript,
-                transcript,
-                file_info.get('created_time'),
-                max_retries=2
-            )
+            # Reuse the transcript from an earlier attempt at the same file contents
+            content_hash = file_info.get('content_hash')
+            transcript = self.transcript_checkpoints.get(content_hash) if content_hash else None
+            
+            if transcript is not None:
+                self.logger.info(f"Reusing saved transcript for {filename}")
+            else:
+                # Let AssemblyAI fetch the audio straight from Dropbox instead of re-uploading our copy
+                audio_url = self.dropbox.get_temporary_link(processing_path)
+                
+                # Transcribe audio with circuit breaker and retry
+                transcript = self.transcription_breaker.call(
+                    self.error_handler.retry_with_backoff,
+                    self.transcription.transcribe,
+                    local_path,
+                    audio_url,
+                    max_retries=3
+                )
+                if content_hash:
+                    self.transcript_checkpoints.put(content_hash, transcript)
+            
+            return processing_path, local_path, transcript
             
+        except Exception as e:
+            # Move back to failed if processing fails
+            self.dropbox.move_to_failed_from_processing(processing_path)
+            raise e
+    
+    def _organize_file(self, file_info: dict, processing_path: str, local_path: Path, transcript: Dict, processed_content: Dict):
+        """Write and upload the output folder for a processed file, then clean up"""
+        filename = file_info['name']
+        
+        try:
             # Organize and save output
             self.organizer.create_output_folder(
                 processed_content,
@@ -100,6 +341,8 @@ class VoiceMemoProcessor:
             # Clean up
             self.dropbox.delete_processing_file(processing_path)
             local_path.unlink()
+            if file_info.get('content_hash'):
+                self.transcript_checkpoints.discard(file_info['content_hash'])
             
             self.logger.info(f"Successfully processed: {filename}")
             
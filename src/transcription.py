@@ -2,16 +2,77 @@
 Audio transcription service using AssemblyAI
 """
 
+import json
 import logging
+import os
 import time
+from itertools import islice
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Optional
 
 import assemblyai as aai
 
 from .config import TranscriptionConfig
 
 
+# Alongside, not inside, the encode and LLM response caches; each cache prunes only its own files
+TRANSCRIPT_CHECKPOINT_DIR = Path("processed") / ".cache" / "transcripts"
+
+# Checkpoints of files that never came back (failed for good, or not re-dropped) are removed after this long
+TRANSCRIPT_CHECKPOINT_MAX_AGE = 30 * 24 * 60 * 60
+
+
+class TranscriptCheckpoints:
+    """
+    Transcripts saved per source file content hash
+    
+    A file that fails after transcription and is dropped back into the inbox
+    reuses its saved transcript instead of paying for transcription again.
+    """
+    
+    def __init__(self, directory: Path, max_age: float = TRANSCRIPT_CHECKPOINT_MAX_AGE):
+        self.directory = directory
+        self.max_age = max_age
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.prune()
+    
+    def get(self, content_hash: str) -> Optional[Dict]:
+        """Return the saved transcript for content_hash, if any"""
+        try:
+            return json.loads((self.directory / f"{content_hash}.json").read_bytes())
+        except (FileNotFoundError, ValueError):
+            return None
+    
+    def put(self, content_hash: str, transcript: Dict):
+        """Save a transcript; written to a temp file and renamed so readers never see a partial one"""
+        path = self.directory / f"{content_hash}.json"
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_bytes(json.dumps(transcript, ensure_ascii=False).encode('utf-8'))
+        os.replace(tmp_path, path)
+        self.prune()
+    
+    def discard(self, content_hash: str):
+        """Remove the saved transcript once its file has been fully processed"""
+        try:
+            (self.directory / f"{content_hash}.json").unlink()
+        except FileNotFoundError:
+            pass
+    
+    def prune(self):
+        """Remove checkpoints (and leftover temp files) older than max_age"""
+        cutoff = time.time() - self.max_age
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if not (entry.is_file() and entry.name.endswith(('.json', '.tmp'))):
+                    continue
+                try:
+                    if entry.stat().st_mtime < cutoff:
+                        os.unlink(entry.path)
+                except FileNotFoundError:
+                    # A concurrent worker pruned or discarded the same entry
+                    pass
+
+
 class TranscriptionService:
     """Handles audio transcription using AssemblyAI"""
     
@@ -38,13 +99,20 @@ class TranscriptionService:
         
         self.logger.info("Initialized AssemblyAI transcription service")
     
-    def transcribe(self, audio_path: Path) -> Dict:
-        """Transcribe audio file and return transcript with metadata"""
+    def transcribe(self, audio_path: Path, audio_url: Optional[str] = None) -> Dict:
+        """
+        Transcribe audio file and return transcript with metadata
+        
+        Args:
+            audio_path: Local copy of the audio
+            audio_url: Publicly fetchable URL of the same audio; when given, AssemblyAI
+                downloads it directly and the local file is not uploaded
+        """
         self.logger.info(f"Starting transcription of: {audio_path.name}")
         
         try:
             # Submit transcription job (this will wait for completion)
-            transcript = self.client.transcribe(str(audio_path))
+            transcript = self.client.transcribe(audio_url or str(audio_path))
             
             if transcript.status == aai.TranscriptStatus.error:
                 raise Exception(f"Transcription failed: {transcript.error}")
@@ -55,21 +123,19 @@ class TranscriptionService:
                 'confidence': getattr(transcript, 'confidence', 0.0),
                 'audio_duration': getattr(transcript, 'audio_duration', 0),
                 'language_code': 'en_us',  # We set this explicitly in config
-                'words': [],
+                'words': {},
                 'sentences': []
             }
             
-            # Add word-level timestamps if available
+            # Add word-level timestamps if available, stored as columns rather than a dict per word
             if transcript.words:
-                result['words'] = [
-                    {
-                        'text': word.text,
-                        'start': word.start,
-                        'end': word.end,
-                        'confidence': word.confidence
-                    }
-                    for word in transcript.words
-                ]
+                words = transcript.words
+                result['words'] = {
+                    'text': [word.text for word in words],
+                    'start': [word.start for word in words],
+                    'end': [word.end for word in words],
+                    'confidence': [word.confidence for word in words]
+                }
             
             # Add sentence-level information
             if hasattr(transcript, 'sentences') and transcript.sentences:
@@ -105,7 +171,8 @@ class TranscriptionService:
         ]
         
         # Add word-level timestamps if available
-        if transcript_data.get('words'):
+        words = transcript_data.get('words')
+        if words:
             lines.extend([
                 "## Word-Level Timestamps",
                 "",
@@ -113,12 +180,14 @@ class TranscriptionService:
                 "|------|------------|----------|------------|"
             ])
             
-            for word in transcript_data['words'][:50]:  # Limit to first 50 words
-                lines.append(
-                    f"| {word['text']} | {word['start']} | {word['end']} | {word['confidence']:.2f} |"
-                )
+            # Limit to first 50 words; islice stops the zip without copying the columns
+            rows = islice(zip(words['text'], words['start'], words['end'], words['confidence']), 50)
+            lines.extend(
+                f"| {text} | {start} | {end} | {confidence:.2f} |"
+                for text, start, end, confidence in rows
+            )
             
-            if len(transcript_data['words']) > 50:
+            if len(words['text']) > 50:
                 lines.append("| ... | ... | ... | ... |")
             
             lines.append("")
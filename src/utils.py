@@ -4,10 +4,30 @@ Utility functions for file processing
 
 import re
 import logging
+import time
 from datetime import datetime
 from typing import Optional
 
 
+# DJI_[number]_YYYYMMDD_HHMMSS
+_DJI_NUMBERED_PATTERN = re.compile(r'^DJI_\d+_(\d{8})_(\d{6})$')
+# DJI_YYYYMMDD_HHMMSS_[suffix]
+_DJI_SUFFIXED_PATTERN = re.compile(r'^DJI_(\d{8})_(\d{6})_\w+$')
+
+# (monotonic expiry, wall-clock time) shared by every filename parsed within a minute
+_now_cache = (0.0, datetime.min)
+
+
+def _now() -> datetime:
+    """Current local time, re-read at most once a minute"""
+    global _now_cache
+    expires, now = _now_cache
+    if time.monotonic() >= expires:
+        now = datetime.now()
+        _now_cache = (time.monotonic() + 60, now)
+    return now
+
+
 def parse_dji_filename_date(filename: str) -> Optional[datetime]:
     """
     Parse datetime from DJI filename formats.
@@ -30,16 +50,14 @@ def parse_dji_filename_date(filename: str) -> Optional[datetime]:
         name_without_ext = filename.rsplit('.', 1)[0]
     
     # Pattern 1: DJI_[number]_YYYYMMDD_HHMMSS
-    pattern1 = r'^DJI_\d+_(\d{8})_(\d{6})$'
-    match1 = re.match(pattern1, name_without_ext)
+    match1 = _DJI_NUMBERED_PATTERN.match(name_without_ext)
     
     if match1:
         date_str, time_str = match1.groups()
         return _parse_dji_datetime(date_str, time_str, logger)
     
     # Pattern 2: DJI_YYYYMMDD_HHMMSS_[suffix]
-    pattern2 = r'^DJI_(\d{8})_(\d{6})_\w+$'
-    match2 = re.match(pattern2, name_without_ext)
+    match2 = _DJI_SUFFIXED_PATTERN.match(name_without_ext)
     
     if match2:
         date_str, time_str = match2.groups()
@@ -77,7 +95,10 @@ def _parse_dji_datetime(date_str: str, time_str: str, logger) -> Optional[dateti
         parsed_dt = datetime(year, month, day, hour, minute, second)
         
         # Validate the date is reasonable (not in future, not too old)
-        now = datetime.now()
+        now = _now()
+        if parsed_dt > now:
+            # The cached time may be up to a minute old; only reject against a fresh reading
+            now = datetime.now()
         if parsed_dt > now:
             logger.warning(f"DJI date {parsed_dt} is in the future, this seems incorrect")
             return None
@@ -0,0 +1,72 @@
+"""
+Tests for DropboxClient against an autospecced Dropbox SDK client
+"""
+
+from unittest import mock
+
+import dropbox
+import pytest
+from dropbox import files
+
+from src.config import DropboxConfig
+from src.dropbox_client import DropboxClient
+
+
+ROOT = "/Ramble"
+
+
+def _created(path):
+    """Batch result entry for a folder that was created"""
+    metadata = files.FolderMetadata(name=path.rsplit('/', 1)[-1], id="id:" + path, path_display=path)
+    return files.CreateFolderBatchResultEntry.success(files.CreateFolderEntryResult(metadata))
+
+
+def _conflict():
+    """Batch result entry for a folder that already exists"""
+    error = files.WriteError.conflict(files.WriteConflictError.folder)
+    return files.CreateFolderBatchResultEntry.failure(files.CreateFolderEntryError.path(error))
+
+
+@pytest.fixture
+def sdk():
+    """Autospecced dropbox.Dropbox instance used by the client under test"""
+    with mock.patch.object(dropbox, "Dropbox", autospec=True) as sdk_class:
+        yield sdk_class.return_value
+
+
+@pytest.fixture
+def client(sdk):
+    return DropboxClient(DropboxConfig(root_folder=ROOT, access_token="token"))
+
+
+def test_ensure_ready_creates_folders_in_one_batch(client, sdk):
+    result = files.CreateFolderBatchResult([_created(f"{ROOT}/inbox"), _conflict(), _conflict(), _conflict()])
+    sdk.files_create_folder_batch.return_value = files.CreateFolderBatchLaunch.complete(result)
+    
+    client.ensure_ready()
+    
+    sdk.users_get_current_account.assert_called_once_with()
+    sdk.files_create_folder_batch.assert_called_once_with(
+        [f"{ROOT}/inbox", f"{ROOT}/processing", f"{ROOT}/failed", f"{ROOT}/processed"]
+    )
+    assert client._ready
+
+
+def test_ensure_ready_polls_async_folder_batch(client, sdk):
+    result = files.CreateFolderBatchResult([_conflict()] * 4)
+    sdk.files_create_folder_batch.return_value = files.CreateFolderBatchLaunch.async_job_id("job")
+    sdk.files_create_folder_batch_check.return_value = files.CreateFolderBatchJobStatus.complete(result)
+    
+    client.ensure_ready()
+    
+    sdk.files_create_folder_batch_check.assert_called_once_with("job")
+    assert client._ready
+
+
+def test_list_inbox_files_after_setup(client, sdk):
+    result = files.CreateFolderBatchResult([_conflict()] * 4)
+    sdk.files_create_folder_batch.return_value = files.CreateFolderBatchLaunch.complete(result)
+    sdk.files_list_folder.return_value = files.ListFolderResult(entries=[], cursor="cursor", has_more=False)
+    
+    assert client.list_inbox_files() == []
+    sdk.files_list_folder.assert_called_once_with(f"{ROOT}/inbox")
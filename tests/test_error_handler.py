@@ -0,0 +1,80 @@
+"""
+Tests for the circuit breaker and retry helpers
+"""
+
+from unittest import mock
+
+import pytest
+
+from src.error_handler import CircuitBreaker, CircuitOpenError
+
+
+def _failing():
+    raise RuntimeError("boom")
+
+
+def _open(breaker):
+    for _ in range(breaker.failure_threshold):
+        with pytest.raises(RuntimeError):
+            breaker.call(_failing)
+
+
+def test_breaker_opens_after_threshold_failures():
+    breaker = CircuitBreaker(failure_threshold=3, recovery_timeout=60)
+    func = mock.Mock(return_value="ok")
+    
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            breaker.call(_failing)
+    assert breaker.state == "CLOSED"
+    
+    with pytest.raises(RuntimeError):
+        breaker.call(_failing)
+    assert breaker.state == "OPEN"
+    
+    with pytest.raises(CircuitOpenError):
+        breaker.call(func)
+    func.assert_not_called()
+
+
+def test_success_resets_failure_count():
+    breaker = CircuitBreaker(failure_threshold=3, recovery_timeout=60)
+    
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            breaker.call(_failing)
+    breaker.call(lambda: "ok")
+    with pytest.raises(RuntimeError):
+        breaker.call(_failing)
+    
+    assert breaker.state == "CLOSED"
+
+
+def test_breaker_recovers_after_cooldown():
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=60)
+    with mock.patch("src.error_handler.time.monotonic", return_value=1000.0):
+        _open(breaker)
+    
+    with mock.patch("src.error_handler.time.monotonic", return_value=1059.0):
+        with pytest.raises(CircuitOpenError):
+            breaker.call(lambda: "ok")
+    
+    with mock.patch("src.error_handler.time.monotonic", return_value=1060.0):
+        assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.state == "CLOSED"
+    assert breaker.failure_count == 0
+
+
+def test_failed_trial_call_reopens_breaker():
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=60)
+    with mock.patch("src.error_handler.time.monotonic", return_value=1000.0):
+        _open(breaker)
+    
+    with mock.patch("src.error_handler.time.monotonic", return_value=1060.0):
+        with pytest.raises(RuntimeError):
+            breaker.call(_failing)
+    assert breaker.state == "OPEN"
+    
+    with mock.patch("src.error_handler.time.monotonic", return_value=1061.0):
+        with pytest.raises(CircuitOpenError):
+            breaker.call(lambda: "ok")
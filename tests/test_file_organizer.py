@@ -0,0 +1,37 @@
+"""
+Tests for FileOrganizer's on-disk caches
+"""
+
+import os
+
+import src.file_organizer as file_organizer
+from src.config import ProcessingConfig
+from src.llm_processor import RESPONSE_CACHE_PATH, ResponseCache
+from src.transcription import TRANSCRIPT_CHECKPOINT_DIR, TranscriptCheckpoints
+
+
+def test_encode_prune_leaves_other_caches_alone(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(file_organizer, "ENCODE_CACHE_ENTRIES", 2)
+    # Stand-in encoder: the prune logic doesn't care what the bytes are
+    monkeypatch.setattr(file_organizer, "_compress_audio", lambda source, destination, bitrate: open(destination, "wb").close())
+    
+    response_cache = ResponseCache(RESPONSE_CACHE_PATH)
+    checkpoints = TranscriptCheckpoints(TRANSCRIPT_CHECKPOINT_DIR)
+    checkpoints.put("hash", {"text": "hello"})
+    organizer = file_organizer.FileOrganizer(ProcessingConfig(
+        compress_audio=True, compression_quality="medium", max_file_size_mb=100, min_file_size_kb=1, polling_interval=60
+    ))
+    organizer._encode_pool.shutdown()
+    encode_dir = organizer._cache_dir
+    
+    for i in range(5):
+        source = tmp_path / f"memo{i}.wav"
+        source.write_bytes(str(i).encode())
+        file_organizer._compress_audio_cached(str(source), str(tmp_path / f"memo{i}.m4a"), "128k", str(encode_dir))
+    
+    assert len(os.listdir(encode_dir)) == 2
+    assert RESPONSE_CACHE_PATH.exists()
+    assert checkpoints.get("hash") == {"text": "hello"}
+    response_cache.set("key", "value")
+    assert response_cache.get("key") == "value"
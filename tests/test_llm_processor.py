@@ -0,0 +1,164 @@
+"""
+Tests for LLMProcessor and LLMPool with mocked provider clients
+"""
+
+import json
+from unittest import mock
+
+import pytest
+
+import src.llm_processor as llm_processor
+from src.config import LLMConfig, LLMEndpointConfig
+from src.llm_processor import LLMPool, LLMProcessor, ResponseCache
+
+
+RESPONSE = json.dumps({"session_title": "Groceries", "keywords": ["food"], "content": "Buy milk"})
+TRANSCRIPT = {"text": "buy milk"}
+
+
+def _stream_returns(client, text):
+    """Make client.messages.stream(...) yield text as a single chunk"""
+    client.messages.stream.return_value.__enter__.return_value.text_stream = [text]
+
+
+@pytest.fixture
+def cache_path(tmp_path, monkeypatch):
+    path = tmp_path / "llm" / "llm_responses.db"
+    monkeypatch.setattr(llm_processor, "RESPONSE_CACHE_PATH", path)
+    return path
+
+
+@pytest.fixture
+def processor(cache_path):
+    processor = LLMProcessor(LLMConfig(service="claude", api_key="key", model="model-a"))
+    processor.client = mock.MagicMock()
+    _stream_returns(processor.client, RESPONSE)
+    return processor
+
+
+def test_response_cache_round_trip(cache_path):
+    cache = ResponseCache(cache_path)
+    key = ResponseCache.make_key("model-a", "prompt")
+    
+    assert cache.get(key) is None
+    cache.set(key, RESPONSE)
+    assert cache.get(key) == RESPONSE
+    assert ResponseCache(cache_path).get(key) == RESPONSE
+
+
+def test_response_cache_keys_on_model_and_prompt():
+    key = ResponseCache.make_key("model-a", "prompt")
+    
+    assert key == ResponseCache.make_key("model-a", "prompt")
+    assert key != ResponseCache.make_key("model-b", "prompt")
+    assert key != ResponseCache.make_key("model-a", "other prompt")
+
+
+def test_identical_prompt_hits_cache(processor):
+    first = processor.process_transcript({"text": "buy milk"})
+    second = processor.process_transcript({"text": "buy milk"})
+    
+    assert first == second
+    assert processor.client.messages.stream.call_count == 1
+
+
+def test_different_model_or_prompt_misses_cache(processor):
+    processor.process_transcript({"text": "buy milk"})
+    processor.process_transcript({"text": "buy milk"}, model="model-b")
+    processor.process_transcript({"text": "buy bread"})
+    
+    assert processor.client.messages.stream.call_count == 3
+
+
+def test_unparseable_response_is_not_cached(processor):
+    _stream_returns(processor.client, "not json")
+    with pytest.raises(Exception):
+        processor.process_transcript({"text": "buy milk"})
+    
+    _stream_returns(processor.client, RESPONSE)
+    processor.process_transcript({"text": "buy milk"})
+    
+    assert processor.client.messages.stream.call_count == 2
+
+
+@pytest.fixture
+def pool():
+    """Two-endpoint pool whose members talk to mocked clients that succeed"""
+    pool = LLMPool(LLMConfig(
+        service="claude", api_key="key", model="primary", cache_mode="off",
+        endpoints=(LLMEndpointConfig(service="claude", api_key="key", model="secondary"),)
+    ))
+    for member in pool.members:
+        member.client = mock.MagicMock()
+        _stream_returns(member.client, RESPONSE)
+    return pool
+
+
+def _fail(member):
+    member.client.messages.stream.side_effect = RuntimeError("rate limited")
+
+
+def test_pool_fails_over_to_secondary(pool):
+    primary, secondary = pool.members
+    _fail(primary)
+    
+    assert pool.process_transcript(TRANSCRIPT)["session_title"] == "Groceries"
+    assert primary.client.messages.stream.call_count == 1
+    assert secondary.client.messages.stream.call_count == 1
+
+
+def test_pool_prefers_primary_when_idle(pool):
+    primary, secondary = pool.members
+    
+    pool.process_transcript(TRANSCRIPT)
+    
+    assert primary.client.messages.stream.call_count == 1
+    assert secondary.client.messages.stream.call_count == 0
+
+
+def test_pool_skips_primary_once_its_breaker_opens(pool):
+    primary, secondary = pool.members
+    _fail(primary)
+    
+    for _ in range(pool.breakers[0].failure_threshold):
+        pool.process_transcript(TRANSCRIPT)
+    assert pool.breakers[0].state == "OPEN"
+    
+    pool.process_transcript(TRANSCRIPT)
+    
+    assert primary.client.messages.stream.call_count == pool.breakers[0].failure_threshold
+    assert secondary.client.messages.stream.call_count == pool.breakers[0].failure_threshold + 1
+
+
+def test_pool_returns_to_primary_after_cooldown(pool):
+    primary, secondary = pool.members
+    breaker = pool.breakers[0]
+    _fail(primary)
+    with mock.patch("src.error_handler.time.monotonic", return_value=1000.0):
+        for _ in range(breaker.failure_threshold):
+            pool.process_transcript(TRANSCRIPT)
+    
+    _stream_returns(primary.client, RESPONSE)
+    primary.client.messages.stream.side_effect = None
+    with mock.patch("src.error_handler.time.monotonic", return_value=1000.0 + breaker.recovery_timeout):
+        pool.process_transcript(TRANSCRIPT)
+    
+    assert breaker.state == "CLOSED"
+    assert primary.client.messages.stream.call_count == breaker.failure_threshold + 1
+
+
+def test_pool_raises_last_error_when_every_endpoint_fails(pool):
+    for member in pool.members:
+        _fail(member)
+    
+    with pytest.raises(Exception, match="rate limited"):
+        pool.process_transcript(TRANSCRIPT)
+
+
+def test_pool_model_override_goes_to_primary(pool):
+    primary, secondary = pool.members
+    _fail(primary)
+    
+    with pytest.raises(Exception, match="rate limited"):
+        pool.process_transcript(TRANSCRIPT, model="fallback")
+    assert secondary.client.messages.stream.call_count == 0
@@ -0,0 +1,100 @@
+"""
+Tests for VoiceMemoProcessor's batch path with mocked services
+"""
+
+import json
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+
+import src.llm_processor as llm_processor
+import src.processor as processor_module
+from src.config import Config, DropboxConfig, LLMConfig, ProcessingConfig, TranscriptionConfig
+
+
+BATCH_TIMEOUT = 120
+RESPONSE = json.dumps({"session_title": "Memo", "keywords": [], "content": "Organized"})
+
+
+class FakeClock:
+    """Stands in for the time module so batch polling runs instantly"""
+    
+    def __init__(self):
+        self.now = 0.0
+    
+    def monotonic(self):
+        return self.now
+    
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(llm_processor, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def processor(tmp_path, monkeypatch, clock):
+    monkeypatch.chdir(tmp_path)
+    for name in ("DropboxClient", "TranscriptionService", "FileOrganizer"):
+        monkeypatch.setattr(processor_module, name, mock.MagicMock())
+    
+    config = Config(
+        dropbox=DropboxConfig(root_folder="/Ramble", access_token="token"),
+        transcription=TranscriptionConfig(service="assemblyai", api_key="key"),
+        llm=LLMConfig(service="claude", api_key="key", model="model", cache_mode="off", batch_timeout=BATCH_TIMEOUT),
+        processing=ProcessingConfig(
+            compress_audio=True, compression_quality="medium", max_file_size_mb=100, min_file_size_kb=1, polling_interval=60
+        ),
+    )
+    processor = processor_module.VoiceMemoProcessor(config)
+    
+    # A batch that never leaves in_progress
+    client = mock.MagicMock()
+    in_progress = SimpleNamespace(id="batch-1", processing_status="in_progress")
+    client.messages.batches.create.return_value = in_progress
+    client.messages.batches.retrieve.return_value = in_progress
+    processor.llm.client = client
+    
+    processor._transcribe_file = lambda file_info: (
+        f"/Ramble/processing/{file_info['name']}", tmp_path / file_info['name'], {"text": file_info['name']}
+    )
+    processor._organize_file = mock.Mock()
+    return processor
+
+
+def test_unfinished_batch_is_cancelled_and_files_go_through_single_file_path(processor, clock):
+    files = [{"name": "a.wav"}, {"name": "b.wav"}, {"name": "c.wav"}]
+    single = mock.Mock(return_value=json.loads(RESPONSE))
+    processor.llm.process_transcript = single
+    
+    processor._process_batch(files)
+    
+    batches = processor.llm.client.messages.batches
+    batches.cancel.assert_called_once_with("batch-1")
+    assert BATCH_TIMEOUT <= clock.now <= BATCH_TIMEOUT + llm_processor.BATCH_POLL_INTERVAL
+    
+    assert sorted(call.args[0]["text"] for call in single.call_args_list) == ["a.wav", "b.wav", "c.wav"]
+    assert processor._organize_file.call_count == 3
+    processor.dropbox.move_to_failed_from_processing.assert_not_called()
+
+
+def test_failed_single_file_fallback_moves_only_that_file_to_failed(processor):
+    files = [{"name": "a.wav"}, {"name": "b.wav"}]
+    
+    def process_transcript(transcript, *args, **kwargs):
+        if transcript["text"] == "b.wav":
+            raise RuntimeError("still down")
+        return json.loads(RESPONSE)
+    
+    processor.llm.process_transcript = mock.Mock(side_effect=process_transcript)
+    processor.error_handler.base_delay = 0
+    
+    processor._process_batch(files)
+    
+    processor.dropbox.move_to_failed_from_processing.assert_called_once_with("/Ramble/processing/b.wav")
+    assert [call.args[0]["name"] for call in processor._organize_file.call_args_list] == ["a.wav"]
@@ -0,0 +1,24 @@
+"""
+Tests for transcript checkpoints
+"""
+
+import os
+
+from src.transcription import TranscriptCheckpoints
+
+
+def test_prune_removes_only_old_checkpoints(tmp_path):
+    checkpoints = TranscriptCheckpoints(tmp_path, max_age=60)
+    checkpoints.put("old", {"text": "old"})
+    checkpoints.put("new", {"text": "new"})
+    (tmp_path / "nested").mkdir()
+    (tmp_path / "other.db").write_bytes(b"")
+    for name in ("old.json", "nested", "other.db"):
+        os.utime(tmp_path / name, (0, 0))
+    
+    checkpoints.prune()
+    
+    assert checkpoints.get("old") is None
+    assert checkpoints.get("new") == {"text": "new"}
+    assert (tmp_path / "nested").is_dir()
+    assert (tmp_path / "other.db").exists()